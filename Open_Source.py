@@ -14,14 +14,23 @@ Student Helper Bot - Telegram-бот для студентов
 """
 
 import logging
-import json
 import os
+import re
+import time
 import asyncio
+import bisect
+import heapq
+import html
+from functools import lru_cache
+from operator import itemgetter
+from contextvars import ContextVar
 from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
 from pathlib import Path
-from typing import Dict, Any, List, Set
+from typing import Dict, Any, FrozenSet, List, Optional, Set, Tuple
 
-from apscheduler.schedulers.background import BackgroundScheduler
+import orjson
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from telegram import (
     Update,
@@ -34,12 +43,14 @@ from telegram import (
     Bot
 )
 from telegram.constants import ParseMode
+from telegram.request import HTTPXRequest
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
     ContextTypes,
     CallbackQueryHandler,
     MessageHandler,
+    TypeHandler,
     filters,
 )
 
@@ -47,6 +58,8 @@ from telegram.ext import (
 from dotenv import load_dotenv
 load_dotenv()
 
+log = logging.getLogger(__name__)
+
 ################################################################################
 #                            CONFIG                                            #
 ################################################################################
@@ -58,12 +71,16 @@ class Config:
     BOT_TOKEN = os.getenv("BOT_TOKEN")
     CHAT_ID = int(os.getenv("CHAT_ID", "0"))
     ALLOWED_GROUP_ID = int(os.getenv("ALLOWED_GROUP_ID", "0"))
+    # Необязательный канал для объявлений об общих дедлайнах: если он задан,
+    # объявление публикуется там один раз вместо личных сообщений всем пользователям
+    BROADCAST_CHANNEL_ID = int(os.getenv("BROADCAST_CHANNEL_ID", "0"))
 
     # Пути к файлам
     BASE_DIR = Path(__file__).parent
     DATA_DIR = BASE_DIR / 'data'
 
-    USERS_FILE = DATA_DIR / 'users.json'
+    USERS_FILE = DATA_DIR / 'users.jsonl'
+    LEGACY_USERS_FILE = DATA_DIR / 'users.json'
     ACTIONS_FILE = DATA_DIR / 'user_actions.json'
     BIRTHDAYS_FILE = DATA_DIR / 'happy.json'
 
@@ -90,14 +107,53 @@ class Config:
 STICKER_ID = "(NoSticker)"  # Не используем.
 DEADLINES_FILE = "deadlines_data.json"
 
-# Глобальный список дедлайнов
+# Часовой пояс дедлайнов: сроки хранятся в памяти как наивные datetime этого пояса,
+# а в файлах — как unix-время, не зависящее от часового пояса машины
+TZ = ZoneInfo("Asia/Yekaterinburg")
+
+# Глобальный список дедлайнов, отсортированный по due_date
 deadlines = []
 
+# Индексы дедлайнов: по ID и по составному ключу (для отсечения дубликатов).
+# _due_keys — unix-время дедлайнов в том же порядке, что и deadlines, для bisect:
+# сравнение float заметно дешевле сравнения datetime.
+# Изменяются только через add_deadline / remove_deadline.
+deadlines_by_id: Dict[int, dict] = {}
+_seen_keys: Set[str] = set()
+_due_keys: List[float] = []
+
+# Те же дедлайны по владельцу: None — общие, иначе ID автора личных.
+# Для каждого — (unix-время, дедлайны) в порядке срока, как _due_keys / deadlines.
+# Список дедлайнов для пользователя собирается только из двух нужных частей.
+_deadlines_by_owner: Dict[Optional[int], Tuple[List[float], List[dict]]] = {}
+
+# Уже отправленные или пропущенные напоминания: (deadline_id, days_before).
+# Отметки живут, пока дедлайн не удален и не вышел из окна REMINDER_GRACE;
+# отметки отправленных напоминаний сохраняются в журнале (операция fired).
+_fired_reminders: Set[Tuple[int, int]] = set()
+
+# Следующий ID дедлайна. Только растет, поэтому ID удаленных дедлайнов
+# не выдаются повторно; сохраняется в журнале при сворачивании.
+_next_deadline_id = 1
+
 # Группа для уведомлений общих дедлайнов
 group_chat_id = None
 
-# Список всех пользователей, которых мы знаем
-known_users = set()
+# Все пользователи, которых мы знаем. Это неизменяемый снимок: UserManager
+# публикует новый при каждом добавлении, поэтому рассылки перебирают его без копирования.
+known_users: FrozenSet[int] = frozenset()
+
+
+def publish_known_users(users: FrozenSet[str]) -> None:
+    """Атомарно заменяет снимок известных пользователей"""
+    global known_users
+    known_users = frozenset(int(user_id) for user_id in users)
+
+
+def add_known_user(user_id: int) -> None:
+    """Публикует снимок с одним новым пользователем, не разбирая заново остальные ID"""
+    global known_users
+    known_users = known_users | {user_id}
 
 
 ################################################################################
@@ -109,20 +165,64 @@ class Database:
     def load_json(file_path: Path, default: Any = None) -> Any:
         if file_path.exists():
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    return json.load(f)
+                return orjson.loads(file_path.read_bytes())
             except Exception as e:
-                logging.error(f"Ошибка чтения {file_path}: {e}")
+                log.error("Ошибка чтения %s: %s", file_path, e)
         return default
 
     @staticmethod
-    def save_json(file_path: Path, data: Any) -> None:
+    def write_atomic(file_path: Path, payload: bytes) -> None:
+        """Записывает файл через временный файл и os.replace, чтобы не оставить его недописанным.
+
+        Временный файл сбрасывается на диск до переименования: иначе после сбоя питания
+        на месте файла может оказаться пустой. Вызывается из потока там, где это возможно
+        (save_json_async, compact_deadlines_async), так что fsync не держит цикл событий.
+        """
+        tmp_path = file_path.with_name(file_path.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+
+    @staticmethod
+    def save_json(file_path: Path, data: Any) -> bool:
+        """Записывает data в JSON. Возвращает False, если запись не удалась"""
         file_path.parent.mkdir(parents=True, exist_ok=True)
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            Database.write_atomic(file_path, payload)
+            return True
+        except Exception as e:
+            log.error("Ошибка записи %s: %s", file_path, e)
+            return False
+
+    @staticmethod
+    async def save_json_async(file_path: Path, data: Any) -> bool:
+        """Как save_json, но запись на диск выполняется в отдельном потоке.
+
+        Сериализация остается в цикле событий: data не меняется, пока ее разбирают.
+        """
+        try:
+            payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            await asyncio.to_thread(Database.write_atomic, file_path, payload)
+            return True
         except Exception as e:
-            logging.error(f"Ошибка записи {file_path}: {e}")
+            log.error("Ошибка записи %s: %s", file_path, e)
+            return False
+
+
+# Интервал отложенной записи хранилищ на диск (в секундах)
+FLUSH_INTERVAL = 2
+
+
+async def flush_periodically(*stores) -> None:
+    """Периодически сбрасывает на диск накопленные изменения хранилищ, не блокируя цикл событий"""
+    while True:
+        await asyncio.sleep(FLUSH_INTERVAL)
+        for store in stores:
+            await store.flush_async()
 
 
 ################################################################################
@@ -130,132 +230,730 @@ class Database:
 ################################################################################
 
 class UserManager:
-    def __init__(self, users_file: Path):
+    """Хранит пользователей в JSONL-файле: один ID на строку, новые дописываются в конец"""
+
+    def __init__(self, users_file: Path, legacy_file: Optional[Path] = None):
         self.users_file = users_file
-        self.users: Set[str] = set(Database.load_json(users_file, default=[]))
+        self.users: Set[str] = set()
+        self._line_count = 0
+        self._load(legacy_file)
+        self._publish()
+
+    def _publish(self) -> None:
+        # Снимок для чтения: рассылки перебирают его, не боясь изменений во время итерации
+        self.users_view: FrozenSet[str] = frozenset(self.users)
+        publish_known_users(self.users_view)
+
+    def _load(self, legacy_file: Optional[Path]) -> None:
+        try:
+            with open(self.users_file, 'rb') as f:
+                for line in f:
+                    if line.strip():
+                        self.users.add(str(orjson.loads(line)))
+                        self._line_count += 1
+        except FileNotFoundError:
+            # Переносим пользователей из старого users.json, если он есть
+            if legacy_file is not None:
+                self.users = set(Database.load_json(legacy_file, default=[]))
+                if self.users:
+                    self.compact()
+        except Exception as e:
+            log.error("Ошибка чтения %s: %s", self.users_file, e)
 
     def add_user(self, user_id: str):
+        if user_id in self.users:
+            return
+
         self.users.add(user_id)
-        Database.save_json(self.users_file, list(self.users))
+        self.users_view = self.users_view | {user_id}
+        add_known_user(int(user_id))
+        self.users_file.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with open(self.users_file, 'ab') as f:
+                f.write(orjson.dumps(user_id) + b"\n")
+            self._line_count += 1
+        except Exception as e:
+            log.error("Ошибка записи %s: %s", self.users_file, e)
+
+    def compact(self) -> None:
+        """Переписывает файл пользователей без повторяющихся строк"""
+        payload = b"".join(orjson.dumps(user_id) + b"\n" for user_id in self.users)
+        try:
+            self.users_file.parent.mkdir(parents=True, exist_ok=True)
+            Database.write_atomic(self.users_file, payload)
+            self._line_count = len(self.users)
+        except Exception as e:
+            log.error("Ошибка записи %s: %s", self.users_file, e)
 
-    def get_users(self) -> Set[str]:
-        return self.users
+    def compact_if_needed(self) -> None:
+        """Сжимает файл, если строк в нем более чем вдвое больше, чем пользователей"""
+        if self._line_count > 2 * len(self.users):
+            self.compact()
+
+    def get_users(self) -> FrozenSet[str]:
+        return self.users_view
 
 
 ################################################################################
 #                ACTION MANAGER                                               #
 ################################################################################
 
+# Пустой словарь для пользователей без действий; только для чтения
+_EMPTY: Dict[str, str] = {}
+ACTION_COOLDOWN = timedelta(days=7)
+
+
 class ActionManager:
     """ Управляет сообщениями вида "Позвать пить пиво" и т.п. """
 
     def __init__(self, actions_file: Path):
         self.actions_file = actions_file
         self.user_actions = Database.load_json(actions_file, default={})
+        self._dirty = False
 
     def can_perform_action(self, user_id: str, action_type: str) -> bool:
-        now = datetime.now()
-        last_str = self.user_actions.get(user_id, {}).get(action_type)
+        last_str = self.user_actions.get(user_id, _EMPTY).get(action_type)
         if last_str:
             last_dt = datetime.fromisoformat(last_str)
-            if now - last_dt < timedelta(days=7):
+            if datetime.now() - last_dt < ACTION_COOLDOWN:
                 return False
         return True
 
     def update_action_time(self, user_id: str, action_type: str):
-        now_str = datetime.now().isoformat()
-        if user_id not in self.user_actions:
-            self.user_actions[user_id] = {}
-        self.user_actions[user_id][action_type] = now_str
-        Database.save_json(self.actions_file, self.user_actions)
+        bucket = self.user_actions.setdefault(user_id, {})
+        bucket[action_type] = datetime.now().isoformat()
+        self._dirty = True
+
+    def flush(self) -> None:
+        """Записывает время действий на диск, если были изменения"""
+        if self._dirty:
+            self._dirty = False
+            if not Database.save_json(self.actions_file, self.user_actions):
+                # Изменения остаются несохраненными: следующий flush повторит запись
+                self._dirty = True
+
+    async def flush_async(self) -> None:
+        """Как flush, но файл записывается в отдельном потоке"""
+        if self._dirty:
+            # Флаг снимается до записи: изменения, пришедшие во время нее, снова его поднимут
+            self._dirty = False
+            if not await Database.save_json_async(self.actions_file, self.user_actions):
+                self._dirty = True
 
 
 ################################################################################
 #                       DEADLINES: LOAD/SAVE + FUNCTIONS                       #
 ################################################################################
 
+def local_now() -> datetime:
+    """Текущее время в поясе TZ без tzinfo — в том же виде, что и сроки дедлайнов"""
+    return datetime.now(TZ).replace(tzinfo=None)
+
+
+def _due_ts(dt: datetime) -> float:
+    """Unix-время наивной даты, понимаемой в поясе TZ"""
+    return dt.replace(tzinfo=TZ).timestamp()
+
+
+def _deadline_key(d: dict) -> str:
+    """Составной ключ дедлайна, по которому определяются дубликаты"""
+    return f"{d['subject']}_{d['title']}_{int(_due_ts(d['due_date']))}_{d['description']}"
+
+
+def _deadline_owner(d: dict) -> Optional[int]:
+    return d['created_by_id'] if d['is_private'] else None
+
+
+def _insert_sorted(keys: List[float], items: List[dict], d: dict, due_ts: float) -> None:
+    pos = bisect.bisect_right(keys, due_ts)
+    keys.insert(pos, due_ts)
+    items.insert(pos, d)
+
+
+def _delete_sorted(keys: List[float], items: List[dict], d: dict) -> None:
+    # Ищем с первого дедлайна с той же датой
+    i = bisect.bisect_left(keys, _due_ts(d['due_date']))
+    while i < len(items) and items[i] is not d:
+        i += 1
+    if i < len(items):
+        del items[i]
+        del keys[i]
+
+
+def add_deadline(d: dict) -> bool:
+    """Добавляет дедлайн в список и индексы. Возвращает False, если это дубликат"""
+    key = _deadline_key(d)
+    if key in _seen_keys:
+        return False
+
+    global _next_deadline_id
+    if d['deadline_id'] in deadlines_by_id:
+        # Так бывает при повторе журнала, записанного старыми версиями
+        d['deadline_id'] = _next_deadline_id
+    _seen_keys.add(key)
+    due_ts = _due_ts(d['due_date'])
+    _insert_sorted(_due_keys, deadlines, d, due_ts)
+    _insert_sorted(*_deadlines_by_owner.setdefault(_deadline_owner(d), ([], [])), d, due_ts)
+    deadlines_by_id[d['deadline_id']] = d
+    _next_deadline_id = max(_next_deadline_id, d['deadline_id'] + 1)
+    return True
+
+
+def remove_deadline(deadline_id: int) -> Optional[dict]:
+    """Удаляет дедлайн по ID из списка и индексов. Возвращает удаленный дедлайн"""
+    removed = deadlines_by_id.pop(deadline_id, None)
+    if removed is None:
+        return None
+
+    _seen_keys.discard(_deadline_key(removed))
+    for days_before in REMINDER_OFFSETS:
+        _fired_reminders.discard((deadline_id, days_before))
+    _delete_sorted(_due_keys, deadlines, removed)
+    owner = _deadline_owner(removed)
+    keys, items = _deadlines_by_owner[owner]
+    _delete_sorted(keys, items, removed)
+    if not items:
+        del _deadlines_by_owner[owner]
+    return removed
+
+
+def _rebuild_deadlines(items) -> Tuple[int, int]:
+    """Заполняет список и индексы за один проход по items.
+
+    Старые версии выдавали ID как len(deadlines) + 1, поэтому в файлах встречаются
+    разные дедлайны с одним ID: такие получают новые ID после последнего занятого.
+    Возвращает число отброшенных дубликатов и число дедлайнов с новым ID.
+    """
+    global _next_deadline_id
+    deadlines.clear()
+    deadlines_by_id.clear()
+    _seen_keys.clear()
+    _deadlines_by_owner.clear()
+
+    duplicates = 0
+    colliding = []
+    for d in items:
+        key = _deadline_key(d)
+        if key in _seen_keys:
+            duplicates += 1
+            continue
+        _seen_keys.add(key)
+        deadlines.append(d)
+        if d['deadline_id'] in deadlines_by_id:
+            colliding.append(d)
+        else:
+            deadlines_by_id[d['deadline_id']] = d
+
+    # Одна сортировка вместо вставки каждого дедлайна на свое место
+    deadlines.sort(key=lambda d: d['due_date'])
+    _due_keys[:] = [_due_ts(d['due_date']) for d in deadlines]
+    for d, due_ts in zip(deadlines, _due_keys):
+        keys, owned = _deadlines_by_owner.setdefault(_deadline_owner(d), ([], []))
+        keys.append(due_ts)
+        owned.append(d)
+    _next_deadline_id = max(deadlines_by_id, default=0) + 1
+    for d in colliding:
+        log.warning("Дедлайну с повторяющимся ID=%s выдан новый ID=%s", d['deadline_id'], _next_deadline_id)
+        d['deadline_id'] = _next_deadline_id
+        deadlines_by_id[_next_deadline_id] = d
+        _next_deadline_id += 1
+    return duplicates, len(colliding)
+
+
+def deadlines_split(moment: datetime) -> int:
+    """Индекс первого дедлайна со сроком не раньше moment.
+
+    deadlines[:i] — истекшие к moment, deadlines[i:] — актуальные.
+    """
+    return bisect.bisect_left(_due_keys, _due_ts(moment))
+
+
+# Время начала обработки текущего апдейта (unix-время), см. _stamp_update_time
+_now_ts: ContextVar[float] = ContextVar('_now_ts')
+
+
+async def _stamp_update_time(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Запоминает время апдейта до запуска остальных обработчиков"""
+    _now_ts.set(time.time())
+
+
+def update_now_ts() -> float:
+    """Время текущего апдейта; вне обработки апдейта — текущее время"""
+    try:
+        return _now_ts.get()
+    except LookupError:
+        return time.time()
+
+
+def visible_deadlines(user_id: int, expired: bool, now_ts: float) -> List[dict]:
+    """Истекшие (expired=True) или актуальные к now_ts дедлайны, видимые пользователю.
+
+    Берет только общие и собственные личные дедлайны: по срезу из каждой части
+    _deadlines_by_owner, без обхода чужих личных дедлайнов.
+    """
+    parts = []
+    for owner in (None, user_id):
+        part = _deadlines_by_owner.get(owner)
+        if part is None:
+            continue
+        keys, items = part
+        split = bisect.bisect_left(keys, now_ts)
+        parts.append((keys[:split], items[:split]) if expired else (keys[split:], items[split:]))
+
+    if len(parts) < 2:
+        return parts[0][1] if parts else []
+    # Слияние по готовым unix-временам: сравнение float вместо datetime
+    merged = heapq.merge(*(zip(keys, items) for keys, items in parts), key=itemgetter(0))
+    return [d for _, d in merged]
+
+
 def remove_duplicate_deadlines():
-    global deadlines
-    unique_deadlines = []
-    seen = set()
+    removed_count, reassigned = _rebuild_deadlines(list(deadlines))
+    if removed_count or reassigned:
+        compact_deadlines()
+    log.info("Удалено %s дубликатов дедлайнов", removed_count)
 
-    for d in deadlines:
-        # Создаем уникальный ключ для каждого дедлайна
-        key = f"{d['subject']}_{d['title']}_{d['due_date'].isoformat()}_{d['description']}"
-        if key not in seen:
-            seen.add(key)
-            unique_deadlines.append(d)
 
-    deadlines = unique_deadlines
-    save_deadlines()
-    logging.info(f"Удалено {len(deadlines) - len(unique_deadlines)} дубликатов дедлайнов")
+def _parse_deadline(d: dict) -> dict:
+    due = d["due_date"]
+    if isinstance(due, str):
+        # Старый формат файла: дата в ISO-строке
+        d["due_date"] = datetime.fromisoformat(due)
+    else:
+        d["due_date"] = datetime.fromtimestamp(due, tz=TZ).replace(tzinfo=None)
+    return d
 
 
-def load_deadlines():
-    global deadlines
+# Дата дедлайна от пользователя: YYYY-MM-DD HH:mm (время в /add_deadline необязательно)
+_DEADLINE_DATE_RE = re.compile(r'(\d{4})-(\d{1,2})-(\d{1,2})(?: (\d{1,2}):(\d{2}))?')
+
+
+def parse_deadline_date(text: str, require_time: bool = True) -> Optional[datetime]:
+    """Разбирает дату дедлайна без strptime. Возвращает None, если формат неверный.
+
+    Если время не указано (и require_time=False), берется конец дня — 23:59.
+    """
+    m = _DEADLINE_DATE_RE.fullmatch(text)
+    if m is None or (require_time and m.group(4) is None):
+        return None
+
+    year, month, day, hour, minute = m.groups()
     try:
-        if os.path.exists(DEADLINES_FILE):
-            with open(DEADLINES_FILE, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                for d in data:
-                    d["due_date"] = datetime.fromisoformat(d["due_date"])
-                deadlines = data
-                remove_duplicate_deadlines()  # Удаляем дубликаты после загрузки
-                logging.info(f"Загружено {len(deadlines)} дедлайнов из файла")
+        if hour is None:
+            return datetime(int(year), int(month), int(day), 23, 59)
+        return datetime(int(year), int(month), int(day), int(hour), int(minute))
+    except ValueError:
+        # Например, 2024-02-30
+        return None
+
+
+def format_due(dt: datetime) -> str:
+    """Дата дедлайна для сообщений: YYYY-MM-DD HH:MM.
+
+    isoformat дает ту же строку, что strftime("%Y-%m-%d %H:%M"), без разбора формата.
+    """
+    return dt.isoformat(sep=' ', timespec='minutes')
+
+
+def _encode_due_date(value):
+    """Сериализует datetime дедлайна в unix-время (секунды) по поясу TZ"""
+    if isinstance(value, datetime):
+        return int(_due_ts(value))
+    raise TypeError
+
+
+def _deadlines_log_path() -> str:
+    """Журнал изменений лежит рядом со снимком: deadlines_data.json -> deadlines_data.log"""
+    return os.path.splitext(DEADLINES_FILE)[0] + ".log"
+
+
+def _load_deadlines_sync() -> Tuple[Optional[List[dict]], List[Tuple[str, Any]]]:
+    """Читает снимок дедлайнов и журнал изменений после него.
+
+    Возвращает (дедлайны снимка или None, если файла нет; операции журнала по порядку).
+    """
+    try:
+        with open(DEADLINES_FILE, "rb") as f:
+            data = orjson.loads(f.read())
+        items = [_parse_deadline(d) for d in data]
+    except FileNotFoundError:
+        items = None
+
+    ops = []
+    try:
+        with open(_deadlines_log_path(), "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = orjson.loads(line)
+                if entry["op"] == "add":
+                    ops.append(("add", _parse_deadline(entry["deadline"])))
+                elif entry["op"] == "del":
+                    ops.append(("del", entry["id"]))
+                elif entry["op"] == "next_id":
+                    ops.append(("next_id", entry["id"]))
+                elif entry["op"] == "fired":
+                    ops.append(("fired", (entry["id"], entry["days"])))
+    except FileNotFoundError:
+        pass
+    return items, ops
+
+
+def _apply_loaded_deadlines(loaded: Tuple[Optional[List[dict]], List[Tuple[str, Any]]]) -> None:
+    """Строит список и индексы из снимка, отсеивая дубликаты, и применяет журнал"""
+    items, ops = loaded
+    _fired_reminders.clear()
+    if items is None and not ops:
+        _rebuild_deadlines(())
+        save_deadlines()
+        log.info("Создан новый файл дедлайнов")
+        return
+
+    global _next_deadline_id
+    removed_count, reassigned = _rebuild_deadlines(items or ())
+    for op, value in ops:
+        if op == "add":
+            add_deadline(value)
+        elif op == "del":
+            remove_deadline(value)
+        elif op == "fired":
+            if value[0] in deadlines_by_id:
+                _fired_reminders.add(value)
         else:
-            deadlines = []
-            save_deadlines()
-            logging.info("Создан новый файл дедлайнов")
+            _next_deadline_id = max(_next_deadline_id, value)
+
+    # Сворачиваем журнал в снимок сразу, чтобы не проигрывать его при каждом запуске
+    if removed_count or reassigned or ops:
+        compact_deadlines()
+    log.info("Загружено %s дедлайнов из файла (удалено дубликатов: %s, операций из журнала: %s)",
+             len(deadlines), removed_count, len(ops))
+
+
+def load_deadlines():
+    try:
+        deadline_ops.flush()
+        _apply_loaded_deadlines(_load_deadlines_sync())
     except Exception as e:
-        logging.error(f"Ошибка чтения файла с дедлайнами: {e}")
-        deadlines = []
+        log.error("Ошибка чтения файла с дедлайнами: %s", e)
+        _rebuild_deadlines(())
+
+
+async def load_deadlines_async():
+    """Как load_deadlines, но чтение и разбор файла не блокируют цикл событий"""
+    try:
+        deadline_ops.flush()
+        loaded = await asyncio.to_thread(_load_deadlines_sync)
+        # Индексы меняются только в потоке цикла событий
+        _apply_loaded_deadlines(loaded)
+    except Exception as e:
+        log.error("Ошибка чтения файла с дедлайнами: %s", e)
+        _rebuild_deadlines(())
+
+
+def _dump_deadlines(obj, option: int = 0) -> bytes:
+    # Даты пишутся как unix-время через default, копировать дедлайны не нужно
+    return orjson.dumps(
+        obj,
+        default=_encode_due_date,
+        option=option | orjson.OPT_PASSTHROUGH_DATETIME
+    )
 
 
 def save_deadlines():
-    global deadlines
-    data_to_save = []
-    for d in deadlines:
-        d_copy = dict(d)
-        d_copy["due_date"] = d["due_date"].isoformat()
-        data_to_save.append(d_copy)
+    """Записывает полный снимок дедлайнов"""
+    Database.write_atomic(Path(DEADLINES_FILE), _dump_deadlines(deadlines, orjson.OPT_INDENT_2))
+
+
+class DeadlineOpLog:
+    """Отложенная дозапись в журнал дедлайнов.
+
+    Операции копятся в памяти, flush дописывает их в файл одним write;
+    его вызывает flush_periodically раз в FLUSH_INTERVAL секунд.
+    """
+
+    def __init__(self):
+        self._pending: List[bytes] = []
+        # Дозапись и сворачивание не должны пересекаться: иначе запись,
+        # ушедшая в поток, могла бы попасть в журнал уже после его очистки
+        self.lock = asyncio.Lock()
+
+    def append(self, entry: dict) -> None:
+        self._pending.append(_dump_deadlines(entry) + b"\n")
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def take(self) -> List[bytes]:
+        """Забирает накопленные операции, оставляя буфер пустым"""
+        batch, self._pending = self._pending, []
+        return batch
+
+    def requeue(self, batch: List[bytes]) -> None:
+        """Возвращает незаписанные операции в начало буфера, порядок сохраняется"""
+        self._pending[:0] = batch
+
+    def flush(self) -> bool:
+        """Дописывает буфер в журнал. Возвращает False, если запись не удалась"""
+        if not self._pending:
+            return True
+        payload = b"".join(self._pending)
+        try:
+            _append_deadlines_log(payload)
+            self._pending.clear()
+            return True
+        except Exception as e:
+            log.error("Ошибка записи журнала дедлайнов: %s", e)
+            return False
+
+    async def flush_async(self) -> None:
+        """Как flush, но файл дописывается в отдельном потоке"""
+        async with self.lock:
+            if not self._pending:
+                return
+            batch = self.take()
+            try:
+                await asyncio.to_thread(_append_deadlines_log, b"".join(batch))
+            except Exception as e:
+                self.requeue(batch)
+                log.error("Ошибка записи журнала дедлайнов: %s", e)
+
+
+def _append_deadlines_log(payload: bytes) -> None:
+    with open(_deadlines_log_path(), "ab") as f:
+        f.write(payload)
+
+
+deadline_ops = DeadlineOpLog()
+
+
+def log_deadline_added(d: dict) -> None:
+    """Фиксирует добавление дедлайна в журнале вместо перезаписи всего файла"""
+    deadline_ops.append({"op": "add", "deadline": d})
+
+
+def log_deadline_removed(deadline_id: int) -> None:
+    """Фиксирует удаление дедлайна в журнале вместо перезаписи всего файла"""
+    deadline_ops.append({"op": "del", "id": deadline_id})
+
+
+def log_reminder_fired(deadline_id: int, days_before: int) -> None:
+    """Фиксирует отправленное напоминание, чтобы не повторить его после перезапуска"""
+    deadline_ops.append({"op": "fired", "id": deadline_id, "days": days_before})
+
+
+# Как часто журнал дедлайнов сворачивается в снимок
+DEADLINES_COMPACT_INTERVAL = timedelta(hours=6)
+DEADLINES_COMPACT_JOB_ID = "deadlines_compact"
+
+
+def compact_deadlines() -> None:
+    """Записывает снимок дедлайнов и очищает журнал.
+
+    До снимка в журнал дописываются все отложенные операции. Если процесс упадет
+    между записью снимка и очисткой журнала, журнал применится к новому снимку
+    без изменений: добавления отсекаются как дубликаты, а удаления записаны
+    в журнал следом за ними. Если буфер записать не удалось, сворачивание
+    откладывается. Вызывающий код держит deadline_ops.lock, когда работает
+    фоновая запись журнала.
+
+    В очищенном журнале остаются отметки отправленных напоминаний и, если
+    следующий ID не выводится из снимка (удалены последние дедлайны), запись next_id.
+    """
+    try:
+        if not deadline_ops.flush():
+            return
+        save_deadlines()
+        _reset_deadlines_log()
+    except Exception as e:
+        log.error("Ошибка сворачивания журнала дедлайнов: %s", e)
+
+
+async def compact_deadlines_async() -> None:
+    """Как compact_deadlines, но журнал и снимок записываются в отдельном потоке.
+
+    Снимок сериализуется в цикле событий одновременно с изъятием буфера, поэтому
+    изъятые операции точно вошли в снимок, а пришедшие во время записи остаются
+    в буфере и попадают уже в очищенный журнал.
+    """
+    try:
+        async with deadline_ops.lock:
+            payload = _dump_deadlines(deadlines, orjson.OPT_INDENT_2)
+            batch = deadline_ops.take()
+            try:
+                if batch:
+                    await asyncio.to_thread(_append_deadlines_log, b"".join(batch))
+            except Exception:
+                deadline_ops.requeue(batch)
+                raise
+            await asyncio.to_thread(Database.write_atomic, Path(DEADLINES_FILE), payload)
+            _reset_deadlines_log()
+    except Exception as e:
+        log.error("Ошибка сворачивания журнала дедлайнов: %s", e)
+
+
+def _reset_deadlines_log() -> None:
+    # Снимок хранит только дедлайны, поэтому счетчик ID и отметки напоминаний
+    # переносятся в очищенный журнал
+    entries = [{"op": "fired", "id": deadline_id, "days": days_before}
+               for deadline_id, days_before in sorted(_fired_reminders)]
+    if _next_deadline_id > max(deadlines_by_id, default=0) + 1:
+        entries.append({"op": "next_id", "id": _next_deadline_id})
+    with open(_deadlines_log_path(), "wb") as f:
+        f.write(b"".join(_dump_deadlines(entry) + b"\n" for entry in entries))
 
-    with open(DEADLINES_FILE, "w", encoding="utf-8") as f:
-        json.dump(data_to_save, f, ensure_ascii=False, indent=2)
+
+def next_deadline_id() -> int:
+    """Следующий свободный ID дедлайна; ID удаленных дедлайнов не переиспользуются"""
+    return _next_deadline_id
 
 
 ################################################################################
 #                      DEADLINE REMINDER JOBS (APScheduler)                   #
 ################################################################################
 
-# Глобальный планировщик для дедлайнов
-deadline_scheduler = BackgroundScheduler(timezone="Asia/Yekaterinburg")
-deadline_scheduler.start()
+# Глобальный планировщик для дедлайнов. Работает в цикле событий бота
+# и запускается в post_init, когда этот цикл уже создан.
+deadline_scheduler = AsyncIOScheduler(timezone=TZ)
+
+# За сколько дней до дедлайна отправляются напоминания
+REMINDER_OFFSETS = (0, 1, 3, 5)
+
+# Как часто диспетчер проверяет, не пора ли отправить напоминания
+REMINDER_CHECK_INTERVAL = timedelta(minutes=1)
+
+# Напоминания, опоздавшие сильнее (например, пока бот был выключен), не отправляются
+REMINDER_GRACE = timedelta(hours=1)
+
+REMINDER_JOB_ID = "deadline_reminders"
+
+# Заголовки напоминаний по числу оставшихся дней
+_URGENCY = {
+    0: "📌 <b>ВНИМАНИЕ! Дедлайн наступает СЕГОДНЯ!</b>",
+    1: "⏰ <b>Напоминание: До дедлайна остался 1 день!</b>",
+    3: "⏰ <b>Напоминание: До дедлайна осталось 3 дня!</b>",
+    5: "⏰ <b>Напоминание: До дедлайна осталось 5 дней!</b>",
+}
+_URGENCY_DEFAULT = "⏰ <b>Напоминание: До дедлайна осталось {days_before} дней!</b>"
+
+_NOTIFICATION_TEMPLATE = (
+    "{urgency}\n\n"
+    "📕 Предмет: {subject}\n"
+    "📝 Задание: {title}\n"
+    "📅 Дата дедлайна: {due}\n"
+    "💬 Описание: {description}\n"
+)
+
+# Общий экземпляр бота для напоминаний: один пул HTTP-соединений на все рассылки.
+# После запуска приложения сюда подставляется бот приложения.
+_BOT: Optional[Bot] = None
+
+# Ограничение числа одновременных запросов при рассылке
+_SEND_SEMAPHORE = asyncio.Semaphore(30)
+
+# Общий лимит рассылок: Bot API допускает около 30 сообщений в секунду
+BROADCAST_RATE = 30
+_broadcast_next_slot = 0.0
+
+
+class OrjsonRequest(HTTPXRequest):
+    """HTTPXRequest, который разбирает ответы Bot API через orjson.
+
+    parse_json_payload — штатная точка расширения PTB для смены JSON-библиотеки.
+    """
+
+    @staticmethod
+    def parse_json_payload(payload: bytes) -> Dict[str, Any]:
+        try:
+            return orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            # Например, невалидный UTF-8: стандартный разбор с errors="replace"
+            return HTTPXRequest.parse_json_payload(payload)
+
+
+def get_bot() -> Bot:
+    """Возвращает общий экземпляр Bot, создавая его при первом обращении"""
+    global _BOT
+    if _BOT is None:
+        _BOT = Bot(token=Config.BOT_TOKEN, request=OrjsonRequest(connection_pool_size=32))
+    return _BOT
+
+
+def register_application_bot(bot: Bot) -> None:
+    """Делает бота приложения общим для напоминаний (вызывается из post_init)"""
+    global _BOT
+    _BOT = bot
+
+
+async def _wait_broadcast_slot() -> None:
+    """Выдает слоты на отправку не чаще BROADCAST_RATE раз в секунду"""
+    global _broadcast_next_slot
+    now = time.monotonic()
+    slot = max(now, _broadcast_next_slot)
+    _broadcast_next_slot = slot + 1 / BROADCAST_RATE
+    if slot > now:
+        await asyncio.sleep(slot - now)
+
+
+async def _deliver_throttled(chat_id, send) -> bool:
+    """Выполняет send() — один запрос рассылки — с учетом лимитов. Возвращает True при успехе"""
+    async with _SEND_SEMAPHORE:
+        await _wait_broadcast_slot()
+        try:
+            await send()
+            return True
+        except Exception as e:
+            log.warning("Не удалось отправить сообщение рассылки chat_id=%s: %s", chat_id, e)
+            return False
+
+
+async def send_throttled(bot, chat_id, text: str, **kwargs) -> bool:
+    """Отправляет одно сообщение рассылки с учетом лимитов. Возвращает True при успехе"""
+    return await _deliver_throttled(chat_id, lambda: bot.send_message(chat_id=chat_id, text=text, **kwargs))
+
 
-async def send_deadline_notification(chat_id, due_time, days_before, deadline_data):
+async def _gather_deliveries(sends) -> int:
+    results = await asyncio.gather(*sends)
+    sent_count = sum(results)
+    log.info("Рассылка завершена: доставлено %s из %s", sent_count, len(results))
+    return sent_count
+
+
+async def broadcast(bot, chat_ids, text: str, **kwargs) -> int:
+    """Рассылает text всем chat_ids параллельно с общим ограничением скорости.
+
+    Возвращает число доставленных сообщений.
+    """
+    return await _gather_deliveries(send_throttled(bot, uid, text, **kwargs) for uid in chat_ids)
+
+
+async def broadcast_copy(bot, chat_ids, from_chat_id, message_id: int, **kwargs) -> int:
+    """Рассылает копию уже отправленного сообщения (copyMessage) всем chat_ids.
+
+    Текст повторно не передается; лимиты те же, что у broadcast.
+    Возвращает число доставленных сообщений.
+    """
+    return await _gather_deliveries(
+        _deliver_throttled(uid, lambda uid=uid: bot.copy_message(
+            chat_id=uid, from_chat_id=from_chat_id, message_id=message_id, **kwargs))
+        for uid in chat_ids
+    )
+
+
+async def send_deadline_notification(chat_id, due_time, days_before, deadline_data, bot: Optional[Bot] = None):
     """Отправляет уведомление о дедлайне"""
     try:
-        from telegram import Bot
-        bot = Bot(token=Config.BOT_TOKEN)
+        bot = bot or get_bot()
         
         # Формируем текст напоминания в зависимости от количества дней
-        if days_before == 0:
-            urgency_text = "📌 <b>ВНИМАНИЕ! Дедлайн наступает СЕГОДНЯ!</b>"
-        elif days_before == 1:
-            urgency_text = "⏰ <b>Напоминание: До дедлайна остался 1 день!</b>"
-        elif days_before == 3:
-            urgency_text = "⏰ <b>Напоминание: До дедлайна осталось 3 дня!</b>"
-        elif days_before == 5:
-            urgency_text = "⏰ <b>Напоминание: До дедлайна осталось 5 дней!</b>"
-        else:
-            urgency_text = f"⏰ <b>Напоминание: До дедлайна осталось {days_before} дней!</b>"
-        
-        msg_text = (
-            f"{urgency_text}\n\n"
-            f"📕 Предмет: {deadline_data['subject']}\n"
-            f"📝 Задание: {deadline_data['title']}\n"
-            f"📅 Дата дедлайна: {due_time.strftime('%Y-%m-%d %H:%M')}\n"
-            f"💬 Описание: {deadline_data['description']}\n"
-        )
+        urgency_text = _URGENCY.get(days_before) or _URGENCY_DEFAULT.format(days_before=days_before)
+
+        msg_text = _NOTIFICATION_TEMPLATE.format_map({
+            "urgency": urgency_text,
+            "subject": deadline_data['subject'],
+            "title": deadline_data['title'],
+            "due": format_due(due_time),
+            "description": deadline_data['description'],
+        })
         
         # Если дедлайн личный, отправляем только создателю
         if deadline_data["is_private"]:
@@ -263,124 +961,153 @@ async def send_deadline_notification(chat_id, due_time, days_before, deadline_da
                 await bot.send_message(
                     chat_id=deadline_data["created_by_id"],
                     text=f"🔒 <b>Личный дедлайн</b>\n{msg_text}",
-                    parse_mode='HTML'
+                    parse_mode=ParseMode.HTML
                 )
-                logging.info(f"Отправлено личное напоминание пользователю {deadline_data['created_by_id']} о дедлайне ID={deadline_data['deadline_id']}")
+                log.info("Отправлено личное напоминание пользователю %s о дедлайне ID=%s", deadline_data['created_by_id'], deadline_data['deadline_id'])
             except Exception as e:
-                logging.error(f"Ошибка отправки личного напоминания пользователю {deadline_data['created_by_id']}: {e}")
+                log.error("Ошибка отправки личного напоминания пользователю %s: %s", deadline_data['created_by_id'], e)
         
         # Если дедлайн общий, отправляем в группу и всем пользователям
         else:
             # Добавляем информацию об авторе для общих дедлайнов
-            author_mention = f"<a href=\"tg://user?id={deadline_data['created_by_id']}\">{deadline_data['author_name']}</a>"
+            author_mention = _author_mention(deadline_data['created_by_id'], deadline_data['author_name'])
             msg_text += f"👤 Автор: {author_mention}"
             
-            # Отправляем в основную группу
             global group_chat_id
             target_chat_id = group_chat_id if group_chat_id else Config.CHAT_ID
-            
-            try:
-                await bot.send_message(
-                    chat_id=target_chat_id,
-                    text=msg_text,
-                    parse_mode='HTML'
-                )
-                logging.info(f"Отправлено напоминание в группу о дедлайне ID={deadline_data['deadline_id']} (за {days_before} дней)")
-            except Exception as e:
-                logging.error(f"Ошибка отправки напоминания в группу: {e}")
-            
-            # Отправляем всем пользователям в личку
-            for user_id in known_users:
+
+            async def _send_group():
                 try:
-                    personal_msg = f"📢 <b>Общий дедлайн</b>\n{msg_text}"
                     await bot.send_message(
-                        chat_id=user_id,
-                        text=personal_msg,
-                        parse_mode='HTML'
+                        chat_id=target_chat_id,
+                        text=msg_text,
+                        parse_mode=ParseMode.HTML
                     )
+                    log.info("Отправлено напоминание в группу о дедлайне ID=%s (за %s дней)", deadline_data['deadline_id'], days_before)
                 except Exception as e:
-                    logging.warning(f"Не удалось отправить напоминание пользователю {user_id}: {e}")
+                    log.error("Ошибка отправки напоминания в группу: %s", e)
+
+            # Текст для личных сообщений один на всех получателей
+            personal_msg = "📢 <b>Общий дедлайн</b>\n" + msg_text
+
+            # Отправляем в основную группу и всем пользователям в личку параллельно
+            await asyncio.gather(
+                _send_group(),
+                broadcast(bot, known_users, personal_msg, parse_mode=ParseMode.HTML),
+                return_exceptions=True
+            )
         
     except Exception as e:
-        logging.error(f"Ошибка в send_deadline_notification: {e}")
+        log.error("Ошибка в send_deadline_notification: %s", e)
 
 
 def schedule_deadline_reminders(deadline_data: dict, context=None) -> None:
-    """Создает отложенные задачи для напоминаний о дедлайне за 0, 1, 3, 5 дней"""
+    """Регистрирует напоминания о дедлайне за 0, 1, 3, 5 дней.
+
+    Отправляет их dispatch_deadline_reminders; здесь напоминания, опоздавшие
+    сильнее REMINDER_GRACE, помечаются выполненными, чтобы не отправить их задним
+    числом. Опоздавшие меньше (например, за время перезапуска) диспетчер отправит.
+    """
     try:
         due_time = deadline_data["due_date"]
         deadline_id = deadline_data["deadline_id"]
-        chat_id = deadline_data.get("created_in_chat", Config.CHAT_ID)
-        
-        # Список смещений: 0, 1, 3, 5 дней до дедлайна
-        offsets = [0, 1, 3, 5]
-        now = datetime.now()
-        
-        for days_before in offsets:
+        now = local_now()
+
+        for days_before in REMINDER_OFFSETS:
             run_time = due_time - timedelta(days=days_before)
-            
-            # Создаем задачу только если время еще не прошло
-            if run_time > now:
-                job_id = f"deadline_{deadline_id}_{days_before}days"
-                
-                # Добавляем задачу в планировщик
-                deadline_scheduler.add_job(
-                    func=lambda c=chat_id, dt=due_time, db=days_before, dd=deadline_data: asyncio.run(
-                        send_deadline_notification(c, dt, db, dd)
-                    ),
-                    trigger='date',
-                    run_date=run_time,
-                    id=job_id,
-                    replace_existing=True  # Заменяем если уже существует
-                )
-                
-                logging.info(f"Запланировано напоминание для дедлайна ID={deadline_id} за {days_before} дней на {run_time}")
-        
+
+            if now - run_time > REMINDER_GRACE:
+                _fired_reminders.add((deadline_id, days_before))
+            else:
+                log.info("Напоминание для дедлайна ID=%s за %s дней будет отправлено диспетчером в %s",
+                         deadline_id, days_before, max(run_time, now))
+
     except Exception as e:
-        logging.error(f"Ошибка при планировании напоминаний для дедлайна: {e}")
+        log.error("Ошибка при планировании напоминаний для дедлайна: %s", e)
 
 
 def cancel_deadline_reminders(deadline_id: int, context=None) -> None:
     """Отменяет все запланированные напоминания для дедлайна"""
     try:
-        # Получаем список всех задач
-        jobs = deadline_scheduler.get_jobs()
-        
-        # Ищем и отменяем все задачи для данного дедлайна
-        jobs_to_remove = []
-        for job in jobs:
-            if job.id and job.id.startswith(f"deadline_{deadline_id}_"):
-                jobs_to_remove.append(job.id)
-        
-        for job_id in jobs_to_remove:
-            try:
-                deadline_scheduler.remove_job(job_id)
-                logging.info(f"Отменено напоминание: {job_id}")
-            except Exception as e:
-                logging.warning(f"Ошибка при отмене задачи {job_id}: {e}")
-        
-        logging.info(f"Отменены все напоминания для дедлайна ID={deadline_id}")
-        
+        # Сам дедлайн уже удален из списка, и диспетчер его не увидит;
+        # сбрасываем отметки, чтобы ID можно было использовать повторно
+        for days_before in REMINDER_OFFSETS:
+            _fired_reminders.discard((deadline_id, days_before))
+
+        log.info("Отменены все напоминания для дедлайна ID=%s", deadline_id)
+
+    except Exception as e:
+        log.error("Ошибка при отмене напоминаний для дедлайна %s: %s", deadline_id, e)
+
+
+def _prune_fired_reminders(horizon: datetime) -> None:
+    """Убирает отметки дедлайнов, удаленных или истекших раньше horizon: диспетчер их больше не рассматривает"""
+    stale = set()
+    for key in _fired_reminders:
+        d = deadlines_by_id.get(key[0])
+        if d is None or d["due_date"] < horizon:
+            stale.add(key)
+    _fired_reminders.difference_update(stale)
+
+
+async def dispatch_deadline_reminders() -> None:
+    """Периодическая задача: отправляет напоминания, время которых наступило"""
+    try:
+        now = local_now()
+        pending = []
+        _prune_fired_reminders(now - REMINDER_GRACE)
+
+        # Дедлайны, истекшие раньше окна опоздания, пропускаем целиком
+        for deadline in deadlines[deadlines_split(now - REMINDER_GRACE):]:
+            due_time = deadline["due_date"]
+
+            for days_before in REMINDER_OFFSETS:
+                key = (deadline["deadline_id"], days_before)
+                if key in _fired_reminders:
+                    continue
+
+                run_time = due_time - timedelta(days=days_before)
+                if run_time <= now:
+                    _fired_reminders.add(key)
+                    if now - run_time <= REMINDER_GRACE:
+                        log_reminder_fired(*key)
+                        chat_id = deadline.get("created_in_chat", Config.CHAT_ID)
+                        pending.append(send_deadline_notification(chat_id, due_time, days_before, deadline))
+
+        if pending:
+            # Отметки попадают на диск до отправки: после перезапуска напоминание не повторится
+            await deadline_ops.flush_async()
+            await asyncio.gather(*pending)
+
     except Exception as e:
-        logging.error(f"Ошибка при отмене напоминаний для дедлайна {deadline_id}: {e}")
+        log.error("Ошибка в диспетчере напоминаний о дедлайнах: %s", e)
 
 
 def restore_deadline_reminders(context=None) -> None:
-    """Восстанавливает запланированные напоминания для всех активных дедлайнов при запуске бота"""
+    """Восстанавливает напоминания для всех дедлайнов и регистрирует диспетчер при запуске бота"""
     try:
-        now = datetime.now()
-        restored_count = 0
-        
-        for deadline in deadlines:
-            # Проверяем только будущие дедлайны
-            if deadline["due_date"] > now:
-                schedule_deadline_reminders(deadline)
-                restored_count += 1
-        
-        logging.info(f"Восстановлено напоминаний для {restored_count} активных дедлайнов")
-        
+        now = local_now()
+
+        # Более старые дедлайны диспетчер все равно не рассматривает
+        for deadline in deadlines[deadlines_split(now - REMINDER_GRACE):]:
+            schedule_deadline_reminders(deadline)
+        restored_count = len(deadlines) - bisect.bisect_right(_due_keys, _due_ts(now))
+
+        # Одна периодическая задача вместо отдельной задачи на каждое напоминание
+        deadline_scheduler.add_job(
+            dispatch_deadline_reminders,
+            trigger='interval',
+            seconds=REMINDER_CHECK_INTERVAL.total_seconds(),
+            id=REMINDER_JOB_ID,
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1
+        )
+
+        log.info("Восстановлено напоминаний для %s активных дедлайнов", restored_count)
+
     except Exception as e:
-        logging.error(f"Ошибка при восстановлении напоминаний дедлайнов: {e}")
+        log.error("Ошибка при восстановлении напоминаний дедлайнов: %s", e)
 
 
 # Функция для совместимости с предыдущими тестами
@@ -392,146 +1119,189 @@ async def callback_deadline_reminder(context) -> None:
         due_time = datetime.fromisoformat(data["due_date_str"]) if isinstance(data["due_date_str"], str) else data.get("due_time", datetime.now())
         days_before = data["days_before"]
         
-        await send_deadline_notification(chat_id, due_time, days_before, data)
+        await send_deadline_notification(chat_id, due_time, days_before, data, bot=context.bot)
         
     except Exception as e:
-        logging.error(f"Ошибка в callback_deadline_reminder: {e}")
+        log.error("Ошибка в callback_deadline_reminder: %s", e)
 
 
 ################################################################################
 #                         BIRTHDAYS FUNCTIONS                                  #
 ################################################################################
 
+# Стандартные форматы дат рождения
+_BDAY_DATE_FORMATS = (
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%Y-%m-%d',
+    '%d.%m.%Y'
+)
+
+# Формат "DD месяц" (например, "27 октября")
+_BDAY_RE = re.compile(r'(\d+)\s+(\w+)')
+
+_MONTH_NAMES: Dict[str, int] = {
+    'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4,
+    'мая': 5, 'июня': 6, 'июля': 7, 'августа': 8,
+    'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12
+}
+
 def convert_excel_to_json(excel_path, json_path):
     """Конвертирует файл Excel с днями рождения в JSON формат"""
-    logging.error("Функция конвертации Excel в JSON недоступна. Pandas не установлен.")
-    logging.info("Используйте готовый JSON-файл с данными о днях рождения.")
+    log.error("Функция конвертации Excel в JSON недоступна. Pandas не установлен.")
+    log.info("Используйте готовый JSON-файл с данными о днях рождения.")
     return False
 
-def load_birthdays():
-    """Загружает данные о днях рождения из JSON-файла"""
+def _parse_birthday(birthday_date) -> Optional[Tuple[int, int]]:
+    """Определяет (месяц, день) по дате рождения из записи или возвращает None"""
+    day = None
+    month = None
+
+    # Если это строка, пытаемся разобрать по разным форматам
+    if isinstance(birthday_date, str):
+        parsed_date = None
+
+        # Пробуем стандартные форматы
+        for date_format in _BDAY_DATE_FORMATS:
+            try:
+                parsed_date = datetime.strptime(birthday_date, date_format)
+                day = parsed_date.day
+                month = parsed_date.month
+                break
+            except ValueError:
+                continue
+
+        # Если стандартные форматы не сработали, проверяем формат "DD месяц"
+        if not parsed_date:
+            match = _BDAY_RE.match(birthday_date)
+            if match:
+                day_str, month_str = match.groups()
+                month_str = month_str.lower()
+
+                if month_str in _MONTH_NAMES:
+                    day = int(day_str)
+                    month = _MONTH_NAMES[month_str]
+                    log.info("Разобрана дата в формате 'день месяц': %s %s -> %s.%s", day_str, month_str, day, month)
+
+    # Если это объект с методом date()
+    elif hasattr(birthday_date, 'date'):
+        date_obj = birthday_date.date()
+        day = date_obj.day
+        month = date_obj.month
+    # Если это datetime
+    elif isinstance(birthday_date, datetime):
+        day = birthday_date.day
+        month = birthday_date.month
+
+    if day and month:
+        return month, day
+    return None
+
+
+# Кэш разобранного файла дней рождения: (st_mtime, st_size, записи)
+_BDAY_CACHE: Optional[Tuple[float, int, List[Tuple[int, int, str]]]] = None
+
+
+def load_birthdays() -> List[Tuple[int, int, str]]:
+    """Загружает дни рождения из JSON-файла в виде списка (месяц, день, фамилия и имя).
+
+    Пока у файла не меняются время изменения и размер, возвращается кэшированный результат.
+    """
+    global _BDAY_CACHE
     try:
-        if os.path.exists(Config.BIRTHDAYS_FILE):
-            # Читаем JSON-файл
-            with open(Config.BIRTHDAYS_FILE, "r", encoding="utf-8") as f:
-                birthdays_data = json.load(f)
+        try:
+            stat = os.stat(Config.BIRTHDAYS_FILE)
+        except FileNotFoundError:
+            stat = None
+
+        if stat is not None:
+            if _BDAY_CACHE is not None and _BDAY_CACHE[:2] == (stat.st_mtime, stat.st_size):
+                return _BDAY_CACHE[2]
+
+            # Читаем JSON-файл. Кэш привязываем к параметрам именно открытого файла,
+            # иначе замена файла между stat и open осталась бы незамеченной
+            try:
+                with open(Config.BIRTHDAYS_FILE, "rb") as f:
+                    stat = os.fstat(f.fileno())
+                    birthdays_data = orjson.loads(f.read())
+            except FileNotFoundError:
+                # Файл удалили после stat
+                return load_birthdays()
             
-            # Преобразуем даты в формат datetime
+            # Разбираем даты один раз при загрузке
             birthdays = []
             for person in birthdays_data:
                 try:
                     # Проверяем, что дата рождения задана корректно
-                    if 'дата рождения' in person and person['дата рождения']:
-                        # Пока храним дату как есть, преобразование будет в check_birthdays
-                        birthdays.append(person)
-                    else:
-                        logging.warning(f"Пропущена запись без даты рождения: {person}")
+                    if not ('дата рождения' in person and person['дата рождения']):
+                        log.warning("Пропущена запись без даты рождения: %s", person)
+                        continue
+
+                    month_day = _parse_birthday(person['дата рождения'])
+                    if month_day is None:
+                        log.debug("Не удалось определить день и месяц для записи: %s", person)
+                        continue
+
+                    # Формируем имя и фамилию
+                    first_name = person.get('имя', '')
+                    last_name = person.get('фамилия', '')
+                    full_name = f"{last_name} {first_name}".strip()
+
+                    if full_name:
+                        birthdays.append((month_day[0], month_day[1], full_name))
                 except Exception as e:
-                    logging.error(f"Ошибка обработки записи дня рождения: {e}")
+                    log.error("Ошибка обработки записи дня рождения %s: %s", person, e)
             
-            logging.info(f"Загружено {len(birthdays)} записей о днях рождения из JSON")
+            log.info("Загружено %s записей о днях рождения из JSON", len(birthdays))
+            _BDAY_CACHE = (stat.st_mtime, stat.st_size, birthdays)
             return birthdays
         else:
             # Попробуем конвертировать из Excel, если существует файл Excel
             excel_path = str(Config.BIRTHDAYS_FILE).replace('.json', '.xlsx')
             if os.path.exists(excel_path):
-                logging.info(f"Пытаемся конвертировать данные из Excel в JSON: {excel_path}")
+                log.info("Пытаемся конвертировать данные из Excel в JSON: %s", excel_path)
                 if convert_excel_to_json(excel_path, Config.BIRTHDAYS_FILE):
                     # Если конвертация успешна, рекурсивно вызываем функцию для загрузки данных
                     return load_birthdays()
             
-            logging.warning(f"Файл с днями рождения не найден: {Config.BIRTHDAYS_FILE}")
+            log.warning("Файл с днями рождения не найден: %s", Config.BIRTHDAYS_FILE)
             return []
     except Exception as e:
-        logging.error(f"Ошибка загрузки данных о днях рождения: {e}")
+        log.error("Ошибка загрузки данных о днях рождения: %s", e)
         return []
 
+
+# Индекс дней рождения вместе со списком, из которого он построен
+_BDAY_INDEX: Optional[Tuple[List[Tuple[int, int, str]], Dict[Tuple[int, int], List[str]]]] = None
+
+
+def build_birthday_index(birthdays: List[Tuple[int, int, str]]) -> Dict[Tuple[int, int], List[str]]:
+    """Группирует именинников по (месяц, день)"""
+    index: Dict[Tuple[int, int], List[str]] = {}
+    for month, day, full_name in birthdays:
+        index.setdefault((month, day), []).append(full_name)
+    return index
+
+
+def get_birthday_index() -> Dict[Tuple[int, int], List[str]]:
+    """Возвращает индекс дней рождения, перестраивая его только при изменении файла"""
+    global _BDAY_INDEX
+    birthdays = load_birthdays()
+    if _BDAY_INDEX is None or _BDAY_INDEX[0] is not birthdays:
+        _BDAY_INDEX = (birthdays, build_birthday_index(birthdays))
+    return _BDAY_INDEX[1]
+
+
 async def check_birthdays(bot):
     """Проверяет, есть ли сегодня дни рождения, и отправляет поздравления"""
     try:
-        birthdays = load_birthdays()
+        # Чтение и разбор файла выполняются в отдельном потоке
+        birthday_index = await asyncio.to_thread(get_birthday_index)
         today = datetime.now().date()
         
-        logging.info(f"Проверка дней рождения на {today.strftime('%Y-%m-%d')}, загружено {len(birthdays)} записей")
-        birthdays_today = []
-        
-        for person in birthdays:
-            try:
-                # Получаем дату рождения из записи
-                birthday_date = person.get('дата рождения')
-                
-                # Проверяем, можно ли определить день и месяц
-                day = None
-                month = None
-                
-                # Если это строка, пытаемся разобрать по разным форматам
-                if isinstance(birthday_date, str):
-                    # Стандартные форматы дат
-                    date_formats = [
-                        '%Y-%m-%dT%H:%M:%S.%f', 
-                        '%Y-%m-%d', 
-                        '%d.%m.%Y'
-                    ]
-                    parsed_date = None
-                    
-                    # Пробуем стандартные форматы
-                    for date_format in date_formats:
-                        try:
-                            parsed_date = datetime.strptime(birthday_date, date_format)
-                            day = parsed_date.day
-                            month = parsed_date.month
-                            break
-                        except ValueError:
-                            continue
-                    
-                    # Если стандартные форматы не сработали, проверяем специальные форматы
-                    if not parsed_date:
-                        # Проверяем формат "DD месяц" (например, "27 октября")
-                        import re
-                        month_names = {
-                            'января': 1, 'февраля': 2, 'марта': 3, 'апреля': 4,
-                            'мая': 5, 'июня': 6, 'июля': 7, 'августа': 8,
-                            'сентября': 9, 'октября': 10, 'ноября': 11, 'декабря': 12
-                        }
-                        
-                        match = re.match(r'(\d+)\s+(\w+)', birthday_date)
-                        if match:
-                            day_str, month_str = match.groups()
-                            month_str = month_str.lower()
-                            
-                            if month_str in month_names:
-                                day = int(day_str)
-                                month = month_names[month_str]
-                                logging.info(f"Разобрана дата в формате 'день месяц': {day_str} {month_str} -> {day}.{month}")
-                
-                # Если это объект с методом date()
-                elif hasattr(birthday_date, 'date'):
-                    date_obj = birthday_date.date()
-                    day = date_obj.day
-                    month = date_obj.month
-                # Если это datetime
-                elif isinstance(birthday_date, datetime):
-                    day = birthday_date.day
-                    month = birthday_date.month
-                
-                # Если удалось определить день и месяц
-                if day and month:
-                    # Проверяем, совпадает ли день и месяц с сегодняшним днем
-                    if today.month == month and today.day == day:
-                        # Формируем имя и фамилию
-                        first_name = person.get('имя', '')
-                        last_name = person.get('фамилия', '')
-                        full_name = f"{last_name} {first_name}".strip()
-                        
-                        if full_name:
-                            birthdays_today.append(full_name)
-                            logging.info(f"Сегодня день рождения у {full_name}")
-                else:
-                    logging.debug(f"Не удалось определить день и месяц для записи: {person}")
-            except Exception as e:
-                logging.error(f"Ошибка при проверке дня рождения для записи {person}: {e}")
-                import traceback
-                logging.error(traceback.format_exc())
+        birthdays_today = birthday_index.get((today.month, today.day), [])
+        log.info("Проверка дней рождения на %s, именинников: %s", today.strftime('%Y-%m-%d'), len(birthdays_today))
+        for full_name in birthdays_today:
+            log.info("Сегодня день рождения у %s", full_name)
         
         # Отправляем поздравления, если есть именинники
         if birthdays_today:
@@ -558,16 +1328,143 @@ async def check_birthdays(bot):
                 await bot.send_message(
                     chat_id=target_chat_id,
                     text=message,
-                    parse_mode='HTML'
+                    parse_mode=ParseMode.HTML
                 )
-                logging.info(f"Отправлено поздравление с днем рождения {len(birthdays_today)} людям")
+                log.info("Отправлено поздравление с днем рождения %s людям", len(birthdays_today))
             except Exception as e:
-                logging.error(f"Ошибка при отправке поздравления: {e}")
+                log.error("Ошибка при отправке поздравления: %s", e)
         else:
-            logging.info("Сегодня нет дней рождения")
+            log.info("Сегодня нет дней рождения")
                 
     except Exception as e:
-        logging.error(f"Ошибка в модуле проверки дней рождения: {e}")
+        log.error("Ошибка в модуле проверки дней рождения: %s", e)
+
+
+################################################################################
+#               MENU CONSTANTS                                                #
+################################################################################
+
+# Неизменяемые шаблоны меню: создаются один раз, а не на каждое нажатие
+_GROUP_TYPES = frozenset({Chat.GROUP, Chat.SUPERGROUP})
+
+_CONTACTS = {
+    'contact_1': (
+        "📌 <b>Учебная часть</b>:\n"
+        "👩‍💼 Ответственная: <b>[Имя администратора]</b>\n"
+        "📞 Тел: +7 XXX XXX-XX-XX доб. XXXX\n"
+        "💬 Telegram: @your_admin_username\n"
+        "📍 [Ваш город], [адрес], каб.[номер]\n"
+        "⏰ 09:30 - 18:00"
+    ),
+    'contact_2': (
+        "👩‍💼 <b>Руководитель программы</b>:\n"
+        "👩‍🏫 <b>[Имя руководителя]</b>\n"
+        "📞 +7 XXX XXX-XX-XX доб.XXXX\n"
+        "💬 Telegram: @your_manager_username\n"
+        "📱 +7 XXX XXX XX XX"
+    )
+}
+
+# callback_data кнопок и тексты кнопок клавиатуры -> тип действия
+_ACTION_MAPPING = {
+    'call_beer': 'beer',
+    'call_board_games': 'board_games',
+    'call_cinema': 'cinema',
+    'call_walk': 'walk'
+}
+
+_TEXT_ACTION_MAPPING = {
+    "🍺 Позвать пить пиво": "beer",
+    "🎲 Позвать в настолки": "board_games",
+    "🎥 Позвать в кино": "cinema",
+    "🚶 Позвать гулять": "walk"
+}
+
+# Текст приглашения и короткое название активности для каждого действия
+_ACTION_DESC = {
+    'beer': "пойти пить пиво",
+    'board_games': "поиграть в настолки",
+    'cinema': "сходить в кино",
+    'walk': "пойти гулять"
+}
+_ACTIVITY_NAMES = {k: v.split(' ')[-1] for k, v in _ACTION_DESC.items()}
+
+# Кнопки меню, которые сразу направляются в handle_menu; компилируется один раз
+_MENU_BUTTONS_RE = re.compile(
+    r'^(🎓 Средний балл диплома|📞 Контакты администрации|📚 Балл по предмету|🍺 Позвать пить пиво|'
+    r'🎲 Позвать в настолки|🎥 Позвать в кино|🚶 Позвать гулять|🗓 Дедлайны)$'
+)
+
+# Тексты кнопок, которые handle_text передает в handle_menu
+_MENU_COMMANDS = frozenset({
+    "🎓 Средний балл диплома",
+    "📚 Балл по предмету",
+    "📞 Контакты администрации",
+    "🗓 Дедлайны",
+    "💳 Оплатить учебу",
+    *_TEXT_ACTION_MAPPING
+})
+
+_DEADLINE_LIST_CALLBACKS = frozenset({"deadline_list", "deadline_list_actual", "deadline_list_expired"})
+
+# Подсказки для расчета среднего балла: в группе — подробная, в личке — короткая
+_DIPLOMA_PROMPT_GROUP = (
+    "📊 <b>Расчет среднего балла диплома</b>\n"
+    "Введите оценки через пробел (от 1 до 10).\n"
+    "Пример: 8 9 7.5 8.5 9"
+)
+_DIPLOMA_PROMPT_PRIVATE = "Введите оценки для <b>диплома</b> (через пробел)."
+_SUBJECT_PROMPT_GROUP = (
+    "📊 <b>Расчет среднего балла предмета</b>\n"
+    "Введите оценки через пробел (от 1 до 10).\n"
+    "Пример: 8 9 7.5 8.5 9"
+)
+_SUBJECT_PROMPT_PRIVATE = "Введите оценки для <b>предмета</b> (через пробел)."
+
+
+# (расчет диплома?, чат — группа?) -> подсказка
+_GRADE_PROMPTS = {
+    (True, True): _DIPLOMA_PROMPT_GROUP,
+    (True, False): _DIPLOMA_PROMPT_PRIVATE,
+    (False, True): _SUBJECT_PROMPT_GROUP,
+    (False, False): _SUBJECT_PROMPT_PRIVATE,
+}
+
+
+def _prompt_for(is_diploma: bool, chat_type: str) -> str:
+    """Подсказка для ввода оценок в зависимости от расчета и типа чата"""
+    return _GRADE_PROMPTS[is_diploma, chat_type in _GROUP_TYPES]
+
+
+_MAIN_MENU_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🎓 Средний балл диплома", callback_data="calc_diploma"),
+     InlineKeyboardButton("📚 Балл по предмету", callback_data="calc_subject")],
+    [InlineKeyboardButton("📞 Контакты", callback_data="contacts"),
+     InlineKeyboardButton("🗓 Дедлайны", callback_data="deadlines")],
+    [InlineKeyboardButton("🍺 Позвать пить пиво", callback_data="call_beer"),
+     InlineKeyboardButton("🎲 Позвать в настолки", callback_data="call_board_games")],
+    [InlineKeyboardButton("🎥 Позвать в кино", callback_data="call_cinema"),
+     InlineKeyboardButton("🚶 Позвать гулять", callback_data="call_walk")],
+    [InlineKeyboardButton("💳 Оплатить учебу", callback_data="pay_education")]
+])
+
+_CONTACTS_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("Учебная часть", callback_data='contact_1'),
+     InlineKeyboardButton("Руководитель", callback_data='contact_2')],
+    [InlineKeyboardButton("Назад", callback_data='main_menu')]
+])
+
+_DEADLINES_MENU_KB = InlineKeyboardMarkup([
+    [InlineKeyboardButton("➕ Добавить", callback_data="deadline_add"),
+     InlineKeyboardButton("📋 Актуальные", callback_data="deadline_list_actual")],
+    [InlineKeyboardButton("📋 Устаревшие", callback_data="deadline_list_expired"),
+     InlineKeyboardButton("❌ Удалить", callback_data="deadline_remove")],
+    [InlineKeyboardButton("📢 Установить группу", callback_data="deadline_group"),
+     InlineKeyboardButton("❓ Помощь", callback_data="deadline_help")]
+])
+
+_BACK_TO_MAIN_KB = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data='main_menu')]])
+_BACK_TO_DEADLINES_KB = InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Назад", callback_data="deadlines")]])
 
 
 ################################################################################
@@ -581,32 +1478,13 @@ class CallbackHandlers:
         await query.answer()
         data = query.data
 
-        contacts = {
-            'contact_1': (
-                "📌 <b>Учебная часть</b>:\n"
-                "👩‍💼 Ответственная: <b>[Имя администратора]</b>\n"
-                "📞 Тел: +7 XXX XXX-XX-XX доб. XXXX\n"
-                "💬 Telegram: @your_admin_username\n"
-                "📍 [Ваш город], [адрес], каб.[номер]\n"
-                "⏰ 09:30 - 18:00"
-            ),
-            'contact_2': (
-                "👩‍💼 <b>Руководитель программы</b>:\n"
-                "👩‍🏫 <b>[Имя руководителя]</b>\n"
-                "📞 +7 XXX XXX-XX-XX доб.XXXX\n"
-                "💬 Telegram: @your_manager_username\n"
-                "📱 +7 XXX XXX XX XX"
-            )
-        }
-
-        if data in contacts:
-            text = contacts[data]
+        if data in _CONTACTS:
+            text = _CONTACTS[data]
             # Добавляем кнопку "Назад" для обоих типов контактов
-            kb = [[InlineKeyboardButton("🔙 Назад", callback_data='main_menu')]]
             await query.edit_message_text(
                 text=text, 
-                parse_mode='HTML', 
-                reply_markup=InlineKeyboardMarkup(kb)
+                parse_mode=ParseMode.HTML, 
+                reply_markup=_BACK_TO_MAIN_KB
             )
         elif data == 'main_menu':
             await query.edit_message_text("Выберите нужный раздел внизу экрана.")
@@ -618,15 +1496,8 @@ class CallbackHandlers:
         data = query.data
 
         # Обработка кнопок вызова действий
-        action_mapping = {
-            'call_beer': 'beer',
-            'call_board_games': 'board_games',
-            'call_cinema': 'cinema',
-            'call_walk': 'walk'
-        }
-
-        if data in action_mapping:
-            action_type = action_mapping[data]
+        action_type = _ACTION_MAPPING.get(data)
+        if action_type:
             await context.bot.delete_message(
                 chat_id=update.effective_chat.id,
                 message_id=query.message.message_id
@@ -646,66 +1517,31 @@ class CallbackHandlers:
                 f"💳 <b>Оплата обучения</b>\n\n"
                 f"Для оплаты обучения перейдите по ссылке:\n"
                 f"<a href='{payment_url}'>Оплатить обучение</a>",
-                parse_mode='HTML',
+                parse_mode=ParseMode.HTML,
                 disable_web_page_preview=False
             )
             return
 
         # Остальные обработчики без изменений
         if data == "calc_diploma":
-            context.user_data['state'] = 'diploma_average'
-            if update.effective_chat.type in [Chat.GROUP, Chat.SUPERGROUP]:
-                await query.message.reply_text(
-                    "📊 <b>Расчет среднего балла диплома</b>\n"
-                    "Введите оценки через пробел (от 1 до 10).\n"
-                    "Пример: 8 9 7.5 8.5 9",
-                    parse_mode='HTML'
-                )
-            else:
-                await query.message.reply_text(
-                    "Введите оценки для <b>диплома</b> (через пробел).",
-                    parse_mode='HTML'
-                )
+            context.user_data['state'] = STATE_DIPLOMA
+            await query.message.reply_text(_prompt_for(True, update.effective_chat.type), parse_mode=ParseMode.HTML)
 
         elif data == "calc_subject":
-            context.user_data['state'] = 'subject_average'
-            if update.effective_chat.type in [Chat.GROUP, Chat.SUPERGROUP]:
-                await query.message.reply_text(
-                    "📊 <b>Расчет среднего балла предмета</b>\n"
-                    "Введите оценки через пробел (от 1 до 10).\n"
-                    "Пример: 8 9 7.5 8.5 9",
-                    parse_mode='HTML'
-                )
-            else:
-                await query.message.reply_text(
-                    "Введите оценки для <b>предмета</b> (через пробел).",
-                    parse_mode='HTML'
-                )
+            context.user_data['state'] = STATE_SUBJECT
+            await query.message.reply_text(_prompt_for(False, update.effective_chat.type), parse_mode=ParseMode.HTML)
 
         elif data == "contacts":
-            kb = [
-                [InlineKeyboardButton("Учебная часть", callback_data='contact_1'),
-                 InlineKeyboardButton("Руководитель", callback_data='contact_2')],
-                [InlineKeyboardButton("Назад", callback_data='main_menu')]
-            ]
             await query.edit_message_text(
                 "Выберите контакт:",
-                reply_markup=InlineKeyboardMarkup(kb)
+                reply_markup=_CONTACTS_KB
             )
 
         elif data == "deadlines":
-            kb = [
-                [InlineKeyboardButton("➕ Добавить", callback_data="deadline_add"),
-                 InlineKeyboardButton("📋 Актуальные", callback_data="deadline_list_actual")],
-                [InlineKeyboardButton("📋 Устаревшие", callback_data="deadline_list_expired"),
-                 InlineKeyboardButton("❌ Удалить", callback_data="deadline_remove")],
-                [InlineKeyboardButton("📢 Установить группу", callback_data="deadline_group"),
-                 InlineKeyboardButton("❓ Помощь", callback_data="deadline_help")]
-            ]
             await query.edit_message_text(
                 "🗓 <b>Меню дедлайнов</b>\nВыберите действие:",
-                reply_markup=InlineKeyboardMarkup(kb),
-                parse_mode='HTML'
+                reply_markup=_DEADLINES_MENU_KB,
+                parse_mode=ParseMode.HTML
             )
 
 
@@ -713,43 +1549,271 @@ class CallbackHandlers:
 #                KEYBOARDS                                                    #
 ################################################################################
 
+# Клавиатура не меняется, поэтому создается один раз
+_MAIN_REPLY_KB = ReplyKeyboardMarkup([
+    [KeyboardButton("🎓 Средний балл диплома")],
+    [KeyboardButton("📞 Контакты администрации")],
+    [KeyboardButton("📚 Балл по предмету")],
+    [KeyboardButton("🍺 Позвать пить пиво"), KeyboardButton("🎲 Позвать в настолки")],
+    [KeyboardButton("🎥 Позвать в кино"), KeyboardButton("🚶 Позвать гулять")],
+    [KeyboardButton("🗓 Дедлайны"), KeyboardButton("💳 Оплатить учебу")]
+], resize_keyboard=True)
+
+
 class Keyboards:
     @staticmethod
     def get_main_keyboard() -> ReplyKeyboardMarkup:
-        keyboard = [
-            [KeyboardButton("🎓 Средний балл диплома")],
-            [KeyboardButton("📞 Контакты администрации")],
-            [KeyboardButton("📚 Балл по предмету")],
-            [KeyboardButton("🍺 Позвать пить пиво"), KeyboardButton("🎲 Позвать в настолки")],
-            [KeyboardButton("🎥 Позвать в кино"), KeyboardButton("🚶 Позвать гулять")],
-            [KeyboardButton("🗓 Дедлайны"), KeyboardButton("💳 Оплатить учебу")]
-        ]
-        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+        return _MAIN_REPLY_KB
 
 
 ################################################################################
 #        STATES FOR ADDING OR REMOVING DEADLINE (STEP-BY-STEP)                #
 ################################################################################
 
-ADD_DEADLINE_FLOW = {
-    'IS_PRIVATE': 1,
-    'SUBJECT': 2,
-    'TITLE': 3,
-    'DATE': 4,
-    'COMMENT': 5,
-    'DONE': 6
-}
+# Единственное состояние диалога с пользователем: context.user_data['state'].
+# Обработчик для каждого состояния — CommandHandlers._STATE_HANDLERS
+STATE_IDLE = 0
+STATE_ADD_IS_PRIVATE = 1
+STATE_ADD_SUBJECT = 2
+STATE_ADD_TITLE = 3
+STATE_ADD_DATE = 4
+STATE_ADD_COMMENT = 5
+STATE_REMOVE_ASK_ID = 6
+STATE_DIPLOMA = 7
+STATE_SUBJECT = 8
 
-REMOVE_DEADLINE_FLOW = {
-    'ASK_ID': 1,
-    'DONE': 2
-}
+# Ответы на вопрос «личный или общий» распознаются по началу слова
+_PRIVATE_PREFIXES = ('лич',)
+_PUBLIC_PREFIXES = ('общ',)
+
+# Более длинные текстовые сообщения бот не обрабатывает
+MAX_TEXT_LENGTH = 1024
 
 
 ################################################################################
 #                 INLINE CALLBACK FOR DEADLINE MENU                           #
 ################################################################################
 
+# Шаблоны сообщений о дедлайнах, заполняются через format_map
+_DEADLINE_TEMPLATE = (
+    "📌 <b>ID: {deadline_id}</b>\n"
+    "📕 Предмет: {subject}\n"
+    "📝 Задание: {title}\n"
+    "📅 Дата: {date_str}\n"
+    "💬 Описание: {description}\n"
+    "🔒 Личный: {privacy}\n"
+    "👤 Автор: {author_mention}"
+)
+
+_NEW_PUBLIC_DEADLINE_TEMPLATE = (
+    "⚠️ <b>Новый ОБЩИЙ дедлайн!</b>\n"
+    "Предмет: {subject}\n"
+    "Задание: {title}\n"
+    "Дата: {date_str}\n"
+    "Описание: {description}\n"
+    "Автор: {author_mention}"
+)
+
+_PUBLIC_DEADLINE_REMOVED_TEMPLATE = (
+    "⚠️ <b>Общий дедлайн удалён!</b>\n"
+    "ID: {deadline_id}\n"
+    "Предмет: {subject}\n"
+    "Задание: {title}\n"
+    "Дата: {date_str}\n"
+    "Удалил(а): {remover_mention}"
+)
+
+# Ответы автору в чате, где дедлайн добавлен или удален
+_DEADLINE_ADDED_TEMPLATE = (
+    "✅ <b>Дедлайн добавлен!</b>\n"
+    "ID: {deadline_id}\n"
+    "Предмет: {subject}\n"
+    "Задание: {title}\n"
+    "Дата: {date_str}\n"
+    "Тип: {visibility}\n"
+    "Описание: {description}\n"
+    "Автор: {author_mention}"
+)
+
+_DEADLINE_REMOVED_REPLY_TEMPLATE = (
+    "❌ Дедлайн ID={deadline_id} удалён!\n"
+    "Предмет: {subject} / Задание: {title}\n"
+    "Удалил(а): {remover_mention}"
+)
+
+
+@lru_cache(maxsize=2048)
+def _author_mention(uid: int, name: str) -> str:
+    """HTML-ссылка на пользователя; авторы повторяются, поэтому строка кэшируется.
+
+    Имя экранируется: символы <, > и & в нем иначе ломают HTML-разметку сообщения.
+    """
+    return f'<a href="tg://user?id={uid}">{html.escape(name)}</a>'
+
+
+def _format_deadline(d: dict) -> str:
+    """Текст карточки дедлайна для списков"""
+    author_id = d.get('created_by_id')
+    if author_id is not None:
+        author_mention = _author_mention(author_id, d.get('author_name', 'Неизвестный'))
+    else:
+        author_mention = "Неизвестный"
+
+    return _DEADLINE_TEMPLATE.format_map(d | {
+        'date_str': format_due(d["due_date"]),
+        'privacy': 'Да' if d['is_private'] else 'Нет',
+        'author_mention': author_mention,
+    })
+
+
+# Предел длины сообщения со списком дедлайнов. Меньше лимита Telegram (4096):
+# тот считает символы в UTF-16, и эмодзи занимают по два
+DEADLINE_LIST_CHUNK = 4000
+
+
+def _chunk_deadline_cards(items: List[dict], limit: int = DEADLINE_LIST_CHUNK,
+                          max_cards: Optional[int] = None) -> List[str]:
+    """Склеивает карточки дедлайнов в сообщения не длиннее limit и не более чем по max_cards"""
+    chunks = []
+    buf = ""
+    count = 0
+    for d in items:
+        card = _format_deadline(d)
+        if buf and (len(buf) + 2 + len(card) > limit or count == max_cards):
+            chunks.append(buf)
+            buf = card
+            count = 1
+        else:
+            buf = f"{buf}\n\n{card}" if buf else card
+            count += 1
+    if buf:
+        chunks.append(buf)
+    return chunks
+
+
+# Карточек на одной странице списка дедлайнов
+DEADLINE_PAGE_SIZE = 10
+
+# Вид списка из callback_data страницы (dl_page:<вид>:<номер>) -> (истекшие?, название)
+_DEADLINE_LIST_KINDS = {
+    "actual": (False, "актуальных"),
+    "expired": (True, "устаревших"),
+}
+
+
+def _render_deadline_page(items: List[dict], kind: str, page: int) -> Tuple[str, InlineKeyboardMarkup]:
+    """Текст одной страницы списка дедлайнов и клавиатура для перехода между страницами"""
+    list_title = _DEADLINE_LIST_KINDS[kind][1]
+    header = f"📋 <b>Список {list_title} дедлайнов</b>"
+    # Запас под заголовок страницы
+    pages = _chunk_deadline_cards(items, DEADLINE_LIST_CHUNK - 200, DEADLINE_PAGE_SIZE)
+    # Список мог сократиться с момента отправки кнопки
+    page = max(0, min(page, len(pages) - 1))
+    if len(pages) > 1:
+        header += f" (стр. {page + 1}/{len(pages)})"
+
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("◀️ Назад", callback_data=f"dl_page:{kind}:{page - 1}"))
+    if page < len(pages) - 1:
+        nav.append(InlineKeyboardButton("Вперёд ▶️", callback_data=f"dl_page:{kind}:{page + 1}"))
+    rows = [nav] if nav else []
+    rows.append([InlineKeyboardButton("🔙 К дедлайнам", callback_data="deadlines")])
+    return f"{header}:\n\n{pages[page]}", InlineKeyboardMarkup(rows)
+
+
+async def deadline_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Переход между страницами списка дедлайнов"""
+    query = update.callback_query
+    await query.answer()
+    try:
+        _, kind, page = query.data.split(":")
+        expired, list_title = _DEADLINE_LIST_KINDS[kind]
+        page = int(page)
+    except (ValueError, KeyError):
+        return
+
+    filtered_deadlines = visible_deadlines(query.from_user.id, expired, update_now_ts())
+    if not filtered_deadlines:
+        await query.edit_message_text(f"Нет {list_title} дедлайнов для просмотра.",
+                                      reply_markup=_BACK_TO_DEADLINES_KB)
+        return
+
+    text, keyboard = _render_deadline_page(filtered_deadlines, kind, page)
+    await query.edit_message_text(text, parse_mode=ParseMode.HTML, reply_markup=keyboard)
+
+
+async def _post_to_channel(bot, text: str) -> bool:
+    """Публикует объявление в канале рассылки. False — канал не задан или публикация не удалась"""
+    if not Config.BROADCAST_CHANNEL_ID:
+        return False
+    try:
+        await bot.send_message(chat_id=Config.BROADCAST_CHANNEL_ID, text=text, parse_mode=ParseMode.HTML)
+        return True
+    except Exception as e:
+        log.warning("Не удалось опубликовать объявление в канале: %s", e)
+        return False
+
+
+async def announce_public_deadline_added(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                        deadline: dict, date_str: str, author_mention: str) -> None:
+    """Сообщает о новом общем дедлайне в группу и всем пользователям в личку (в фоне)"""
+    target_chat_id = group_chat_id if group_chat_id else deadline['created_in_chat']
+    msg_text = _NEW_PUBLIC_DEADLINE_TEMPLATE.format_map(deadline | {
+        'date_str': date_str,
+        'author_mention': author_mention,
+    })
+    group_post = None
+    try:
+        # Отправляем уведомление в группу только если дедлайн был создан не в ней
+        if update.effective_chat.type == Chat.PRIVATE:
+            group_post = await context.bot.send_message(chat_id=target_chat_id, text=msg_text, parse_mode=ParseMode.HTML)
+            log.info("Отправлено уведомление в группу о новом дедлайне из личного чата")
+    except Exception as e:
+        log.warning("Не удалось отправить уведомление в группу: %s", e)
+
+    # Один пост в канале вместо рассылки; без канала — рассылка в личку
+    if await _post_to_channel(context.bot, msg_text):
+        return
+
+    # Рассылаем уведомление в личку в фоне, не задерживая ответ.
+    # Тому, кто создал дедлайн, уведомление не отправляем
+    recipients = known_users - {deadline['created_by_id']}
+    if group_post is not None:
+        # Копируем пост из группы вместо повторной отправки текста
+        job = broadcast_copy(context.bot, recipients, target_chat_id, group_post.message_id,
+                             disable_notification=True)
+    else:
+        job = broadcast(context.bot, recipients, "(Общий дедлайн) " + msg_text, parse_mode=ParseMode.HTML,
+                        disable_notification=True)
+    context.application.create_task(job)
+
+
+async def announce_public_deadline_removed(update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                          removed: dict, remover_mention: str) -> None:
+    """Сообщает об удалении общего дедлайна в группу и всем пользователям в личку (в фоне)"""
+    target_chat_id = group_chat_id if group_chat_id else Config.CHAT_ID
+    text_for_group = _PUBLIC_DEADLINE_REMOVED_TEMPLATE.format_map(removed | {
+        'date_str': format_due(removed['due_date']),
+        'remover_mention': remover_mention,
+    })
+
+    group_post = None
+    try:
+        group_post = await context.bot.send_message(chat_id=target_chat_id, text=text_for_group, parse_mode=ParseMode.HTML)
+    except Exception as e:
+        log.warning("Не удалось отправить сообщение об удалении в группу: %s", e)
+
+    if await _post_to_channel(context.bot, text_for_group) or group_post is None:
+        return
+
+    # Копируем пост из группы всем пользователям в личку, кроме того, кто удалил
+    recipients = known_users - {update.effective_user.id}
+    context.application.create_task(
+        broadcast_copy(context.bot, recipients, target_chat_id, group_post.message_id, disable_notification=True)
+    )
+
+
 async def deadline_menu_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await query.answer()
@@ -757,79 +1821,28 @@ async def deadline_menu_callback(update: Update, context: ContextTypes.DEFAULT_T
 
     if data == "deadline_add":
         context.user_data['deadline_flow'] = {}
-        context.user_data['deadline_flow_step'] = ADD_DEADLINE_FLOW['IS_PRIVATE']
+        context.user_data['state'] = STATE_ADD_IS_PRIVATE
         await query.edit_message_text("Хотите добавить ЛИЧНЫЙ (введите 'Личный') или ОБЩИЙ (введите 'Общий') дедлайн?")
 
-    elif data in ["deadline_list", "deadline_list_actual", "deadline_list_expired"]:
+    elif data in _DEADLINE_LIST_CALLBACKS:
         user_id = query.from_user.id
         if not deadlines:
             msg = "Пока нет ни одного дедлайна!"
-            await query.edit_message_text(msg, parse_mode='HTML')
+            await query.edit_message_text(msg, parse_mode=ParseMode.HTML)
             return
             
-        # Определяем текущую дату для сравнения
-        current_date = datetime.now()
-        
-        # Фильтруем дедлайны в зависимости от типа запроса
-        filtered_deadlines = []
         is_expired_list = (data == "deadline_list_expired")
         list_title = "устаревших" if is_expired_list else "актуальных"
-        
-        for d in deadlines:
-            # Пропускаем личные дедлайны других пользователей
-            if d["is_private"] and d["created_by_id"] != user_id:
-                continue
-                
-            # Определяем, истек ли срок дедлайна
-            is_expired = d["due_date"] < current_date
-            
-            # Добавляем дедлайн в список, если он соответствует запрошенному типу
-            if (is_expired and is_expired_list) or (not is_expired and not is_expired_list):
-                filtered_deadlines.append(d)
+        filtered_deadlines = visible_deadlines(user_id, is_expired_list, update_now_ts())
         
         if not filtered_deadlines:
             msg = f"Нет {list_title} дедлайнов для просмотра."
-            await query.edit_message_text(msg, parse_mode='HTML')
+            await query.edit_message_text(msg, parse_mode=ParseMode.HTML)
             return
             
-        # Формируем сообщение с заголовком
-        msg = f"📋 <b>Список {list_title} дедлайнов</b>:\n\n"
-        
-        # Добавляем кнопку Назад
-        kb = [[InlineKeyboardButton("🔙 Назад", callback_data="deadlines")]]
-        
-        # Отправляем первое сообщение с заголовком
-        await query.edit_message_text(msg, parse_mode='HTML', reply_markup=InlineKeyboardMarkup(kb))
-        
-        # Отправляем каждый дедлайн отдельным сообщением
-        for d in filtered_deadlines:
-            try:
-                date_str = d["due_date"].strftime("%Y-%m-%d %H:%M")
-                try:
-                    author_name = d.get('author_name', 'Неизвестный')
-                    author_mention = f"<a href=\"tg://user?id={d['created_by_id']}\">{author_name}</a>"
-                except:
-                    author_mention = "Неизвестный"
-                
-                deadline_msg = (
-                    f"📌 <b>ID: {d['deadline_id']}</b>\n"
-                    f"📕 Предмет: {d['subject']}\n"
-                    f"📝 Задание: {d['title']}\n"
-                    f"📅 Дата: {date_str}\n"
-                    f"💬 Описание: {d['description']}\n"
-                    f"🔒 Личный: {'Да' if d['is_private'] else 'Нет'}\n"
-                    f"👤 Автор: {author_mention}"
-                )
-                
-                # Отправляем отдельное сообщение для каждого дедлайна
-                await context.bot.send_message(
-                    chat_id=update.effective_chat.id,
-                    text=deadline_msg,
-                    parse_mode='HTML'
-                )
-            except Exception as e:
-                logging.error(f"Ошибка при отправке дедлайна: {e}")
-                # Продолжаем с другими дедлайнами в случае ошибки
+        # Первая страница списка вместо отдельного сообщения на каждый дедлайн
+        text, keyboard = _render_deadline_page(filtered_deadlines, "expired" if is_expired_list else "actual", 0)
+        await query.edit_message_text(text, parse_mode=ParseMode.HTML, reply_markup=keyboard)
 
     elif data == "deadline_group":
         await query.edit_message_text("Установить группу: /set_group (в группе)")
@@ -838,13 +1851,83 @@ async def deadline_menu_callback(update: Update, context: ContextTypes.DEFAULT_T
         await query.edit_message_text("Воспользуйтесь командой /help")
 
     elif data == "deadline_remove":
-        context.user_data['remove_flow_step'] = REMOVE_DEADLINE_FLOW['ASK_ID']
+        context.user_data['state'] = STATE_REMOVE_ASK_ID
         await query.edit_message_text("Введите ID дедлайна, который хотите удалить.")
 
     else:
         await query.edit_message_text("Неизвестная команда")
 
 
+# callback_data кнопки -> обработчик; один поиск в словаре вместо перебора регулярных выражений
+_CALLBACK_ROUTES = {
+    **dict.fromkeys(
+        ('calc_diploma', 'calc_subject', 'contacts', 'deadlines', 'call_beer', 'call_board_games',
+         'call_cinema', 'call_walk', 'pay_education'),
+        CallbackHandlers.menu_callback,
+    ),
+    **dict.fromkeys(('contact_1', 'contact_2', 'main_menu'), CallbackHandlers.contact_callback),
+    **dict.fromkeys(
+        ('deadline_add', 'deadline_list', 'deadline_list_actual', 'deadline_list_expired',
+         'deadline_group', 'deadline_help', 'deadline_remove'),
+        deadline_menu_callback,
+    ),
+}
+
+# Кнопки с параметром в callback_data: префикс до ':' -> обработчик
+_CALLBACK_PREFIX_ROUTES = {
+    'dl_page': deadline_page_callback,
+}
+
+
+async def route_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Единственный обработчик callback-кнопок: передает запрос нужному обработчику"""
+    data = update.callback_query.data or ""
+    handler = _CALLBACK_ROUTES.get(data) or _CALLBACK_PREFIX_ROUTES.get(data.partition(':')[0])
+    if handler is not None:
+        await handler(update, context)
+    else:
+        # Кнопка из старой версии бота: просто убираем индикатор загрузки
+        await update.callback_query.answer()
+
+
+################################################################################
+#                       GRADE AVERAGE HELPERS                                 #
+################################################################################
+
+# Пороги среднего балла и оценка словами, по убыванию порога
+_GRADE_WORDS = (
+    (9.5, "Отлично с отличием"),
+    (8.5, "Отлично"),
+    (7.0, "Очень хорошо"),
+    (6.0, "Хорошо"),
+    (4.0, "Удовлетворительно"),
+)
+
+
+def parse_grades(tokens: List[str]) -> Tuple[List[float], Optional[float]]:
+    """Разбирает оценки за один проход, пропуская нечисловые значения.
+
+    Возвращает (оценки, первая оценка вне диапазона 1-10 или None).
+    """
+    grades = []
+    for token in tokens:
+        try:
+            n = float(token)
+        except ValueError:
+            continue
+        if not 1 <= n <= 10:  # 10-балльная система
+            return grades, n
+        grades.append(n)
+    return grades, None
+
+
+def get_grade_word(avg: float) -> str:
+    for threshold, word in _GRADE_WORDS:
+        if avg >= threshold:
+            return word
+    return "Неудовлетворительно"
+
+
 ################################################################################
 #          MAIN COMMAND HANDLERS CLASS (START / MENU / ETC.)                  #
 ################################################################################
@@ -857,7 +1940,6 @@ class CommandHandlers:
     async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         user_id = str(update.effective_user.id)
         self.user_manager.add_user(user_id)
-        known_users.add(update.effective_user.id)
 
         txt = (
             "👋 <b>Привет!</b> Я бот с функционалом дедлайнов и кнопок!\n\n"
@@ -872,7 +1954,7 @@ class CommandHandlers:
         # Отправляем приветственное сообщение без inline-кнопок
         await update.message.reply_text(
             txt,
-            parse_mode='HTML',
+            parse_mode=ParseMode.HTML,
             reply_markup=None  # Убираем любую клавиатуру
         )
 
@@ -881,88 +1963,36 @@ class CommandHandlers:
 
         # Если это первое открытие меню, показываем базовые кнопки
         if txt == "/menu":
-            kb = [
-                [InlineKeyboardButton("🎓 Средний балл диплома", callback_data="calc_diploma"),
-                 InlineKeyboardButton("📚 Балл по предмету", callback_data="calc_subject")],
-                [InlineKeyboardButton("📞 Контакты", callback_data="contacts"),
-                 InlineKeyboardButton("🗓 Дедлайны", callback_data="deadlines")],
-                [InlineKeyboardButton("🍺 Позвать пить пиво", callback_data="call_beer"),
-                 InlineKeyboardButton("🎲 Позвать в настолки", callback_data="call_board_games")],
-                [InlineKeyboardButton("🎥 Позвать в кино", callback_data="call_cinema"),
-                 InlineKeyboardButton("🚶 Позвать гулять", callback_data="call_walk")],
-                [InlineKeyboardButton("💳 Оплатить учебу", callback_data="pay_education")]
-            ]
             await update.message.reply_text(
                 "🔸 <b>Главное меню</b>\nВыберите действие:",
-                reply_markup=InlineKeyboardMarkup(kb),
-                parse_mode='HTML'
+                reply_markup=_MAIN_MENU_KB,
+                parse_mode=ParseMode.HTML
             )
             return
 
         # Проверяем, что сообщение из разрешенной группы или личных сообщений
-        if update.effective_chat.type in [Chat.GROUP, Chat.SUPERGROUP]:
+        if update.effective_chat.type in _GROUP_TYPES:
             if update.effective_chat.id != Config.ALLOWED_GROUP_ID:
                 await update.message.reply_text("❌ Бот работает только в определенной группе!")
                 return
 
         # Остальная логика обработки меню...
         if txt == "🎓 Средний балл диплома":
-            context.user_data['state'] = 'diploma_average'  # Устанавливаем состояние
-            if update.effective_chat.type in [Chat.GROUP, Chat.SUPERGROUP]:
-                await update.message.reply_text(
-                    "📊 <b>Расчет среднего балла диплома</b>\n"
-                    "Введите оценки через пробел (от 1 до 10).\n"
-                    "Пример: 8 9 7.5 8.5 9",
-                    parse_mode='HTML'
-                )
-            else:
-                await update.message.reply_text(
-                    "Введите оценки для <b>диплома</b> (через пробел).",
-                    parse_mode='HTML'
-                )
+            context.user_data['state'] = STATE_DIPLOMA  # Устанавливаем состояние
+            await update.message.reply_text(_prompt_for(True, update.effective_chat.type), parse_mode=ParseMode.HTML)
         elif txt == "📚 Балл по предмету":
-            context.user_data['state'] = 'subject_average'  # Устанавливаем состояние
-            if update.effective_chat.type in [Chat.GROUP, Chat.SUPERGROUP]:
-                await update.message.reply_text(
-                    "📊 <b>Расчет среднего балла предмета</b>\n"
-                    "Введите оценки через пробел (от 1 до 10).\n"
-                    "Пример: 8 9 7.5 8.5 9",
-                    parse_mode='HTML'
-                )
-            else:
-                await update.message.reply_text(
-                    "Введите оценки для <b>предмета</b> (через пробел).",
-                    parse_mode='HTML'
-                )
+            context.user_data['state'] = STATE_SUBJECT  # Устанавливаем состояние
+            await update.message.reply_text(_prompt_for(False, update.effective_chat.type), parse_mode=ParseMode.HTML)
         elif txt == "📞 Контакты администрации":
-            kb = [
-                [InlineKeyboardButton("Учебная часть", callback_data='contact_1'),
-                 InlineKeyboardButton("Руководитель", callback_data='contact_2')],
-                [InlineKeyboardButton("Назад", callback_data='main_menu')]
-            ]
-            await update.message.reply_text("Выберите контакт:", reply_markup=InlineKeyboardMarkup(kb))
-        elif txt in ["🍺 Позвать пить пиво", "🎲 Позвать в настолки", "🎥 Позвать в кино", "🚶 Позвать гулять"]:
-            mapping = {
-                "🍺 Позвать пить пиво": "beer",
-                "🎲 Позвать в настолки": "board_games",
-                "🎥 Позвать в кино": "cinema",
-                "🚶 Позвать гулять": "walk"
-            }
-            action_type = mapping.get(txt)
+            await update.message.reply_text("Выберите контакт:", reply_markup=_CONTACTS_KB)
+        elif txt in _TEXT_ACTION_MAPPING:
+            action_type = _TEXT_ACTION_MAPPING[txt]
             await self._call_action(update, context, action_type)
         elif txt == "🗓 Дедлайны":
-            kb = [
-                [InlineKeyboardButton("➕ Добавить", callback_data="deadline_add"),
-                 InlineKeyboardButton("📋 Актуальные", callback_data="deadline_list_actual")],
-                [InlineKeyboardButton("📋 Устаревшие", callback_data="deadline_list_expired"),
-                 InlineKeyboardButton("❌ Удалить", callback_data="deadline_remove")],
-                [InlineKeyboardButton("📢 Установить группу", callback_data="deadline_group"),
-                 InlineKeyboardButton("❓ Помощь", callback_data="deadline_help")]
-            ]
             await update.message.reply_text(
                 "🗓 <b>Меню дедлайнов</b>\nВыберите действие:",
-                reply_markup=InlineKeyboardMarkup(kb),
-                parse_mode='HTML'
+                reply_markup=_DEADLINES_MENU_KB,
+                parse_mode=ParseMode.HTML
             )
         elif txt == "💳 Оплатить учебу":
             payment_url = "https://your-payment-system.com/payment"
@@ -970,42 +2000,20 @@ class CommandHandlers:
                 f"💳 <b>Оплата обучения</b>\n\n"
                 f"Для оплаты обучения перейдите по ссылке:\n"
                 f"<a href='{payment_url}'>Оплатить обучение</a>",
-                parse_mode='HTML',
+                parse_mode=ParseMode.HTML,
                 disable_web_page_preview=False
             )
 
     async def diploma_cmd(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        context.user_data['state'] = 'diploma_average'
-        if update.effective_chat.type in [Chat.GROUP, Chat.SUPERGROUP]:
-            await update.message.reply_text(
-                "📊 <b>Расчет среднего балла диплома</b>\n"
-                "Введите оценки через пробел (от 1 до 10).\n"
-                "Пример: 8 9 7.5 8.5 9",
-                parse_mode='HTML'
-            )
-        else:
-            await update.message.reply_text(
-                "Введите оценки для <b>диплома</b> (через пробел).",
-                parse_mode='HTML'
-            )
+        context.user_data['state'] = STATE_DIPLOMA
+        await update.message.reply_text(_prompt_for(True, update.effective_chat.type), parse_mode=ParseMode.HTML)
 
     async def subject_cmd(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        context.user_data['state'] = 'subject_average'
-        if update.effective_chat.type in [Chat.GROUP, Chat.SUPERGROUP]:
-            await update.message.reply_text(
-                "📊 <b>Расчет среднего балла предмета</b>\n"
-                "Введите оценки через пробел (от 1 до 10).\n"
-                "Пример: 8 9 7.5 8.5 9",
-                parse_mode='HTML'
-            )
-        else:
-            await update.message.reply_text(
-                "Введите оценки для <b>предмета</b> (через пробел).",
-                parse_mode='HTML'
-            )
+        context.user_data['state'] = STATE_SUBJECT
+        await update.message.reply_text(_prompt_for(False, update.effective_chat.type), parse_mode=ParseMode.HTML)
 
     async def handle_text(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-        state = context.user_data.get('state')
+        state = context.user_data.get('state', STATE_IDLE)
         
         # Проверяем, что update.message не None перед доступом к text
         if not update.message:
@@ -1013,276 +2021,206 @@ class CommandHandlers:
             
         txt = update.message.text.strip()
 
-        if update.effective_user:
-            known_users.add(update.effective_user.id)
+        # В рассылки попадают только те, кто писал боту в личку: остальным бот
+        # написать не может, и попытка лишь тратит место в лимите отправки
+        if update.effective_user and update.effective_chat.type == Chat.PRIVATE:
+            self.user_manager.add_user(str(update.effective_user.id))
 
-        flow_step = context.user_data.get('deadline_flow_step')
-        remove_flow_step = context.user_data.get('remove_flow_step')
+        if len(txt) > MAX_TEXT_LENGTH:
+            if update.effective_chat.type == Chat.PRIVATE:
+                await update.message.reply_text("❗️ Слишком длинное сообщение.")
+            return
 
         # Проверяем, что сообщение из разрешенной группы или личных сообщений
-        if update.effective_chat.type in [Chat.GROUP, Chat.SUPERGROUP]:
+        if update.effective_chat.type in _GROUP_TYPES:
             if update.effective_chat.id != Config.ALLOWED_GROUP_ID:
                 await update.message.reply_text("❌ Бот работает только в определенной группе!")
                 return
 
-        if flow_step:
-            await self._deadline_flow_handler(update, context, txt)
-            return
-        elif remove_flow_step:
-            await self._deadline_remove_handler(update, context, txt)
-            return
-        elif state == 'diploma_average':
-            await self._calc_average(update, context, txt, is_diploma=True)
-        elif state == 'subject_average':
-            await self._calc_average(update, context, txt, is_diploma=False)
-        elif update.message and update.message.text:  # Добавляем проверку на текстовое сообщение
+        # Один поиск по таблице вместо цепочки проверок состояний
+        handler = self._STATE_HANDLERS.get(state)
+        if handler is not None:
+            await handler(self, update, context, txt)
+        elif update.message.text:
             # Проверяем, является ли сообщение командой меню
-            menu_commands = {
-                "🎓 Средний балл диплома",
-                "📚 Балл по предмету",
-                "📞 Контакты администрации",
-                "🗓 Дедлайны",
-                "🍺 Позвать пить пиво",
-                "🎲 Позвать в настолки",
-                "🎥 Позвать в кино",
-                "🚶 Позвать гулять"
-            }
-            if txt in menu_commands:
+            if txt in _MENU_COMMANDS:
                 await self.handle_menu(update, context)
             elif update.effective_chat.type == Chat.PRIVATE:
                 # Отвечаем на непонятные сообщения только в личке
                 await update.message.reply_text("❓ Не понял команду. Воспользуйтесь меню.")
 
-    async def _deadline_flow_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE, txt: str) -> None:
-        step = context.user_data['deadline_flow_step']
-        flow_data = context.user_data.setdefault('deadline_flow', {})
-
-        if step == ADD_DEADLINE_FLOW['IS_PRIVATE']:
-            txt_lower = txt.lower()
-            if 'личн' in txt_lower:
-                flow_data['is_private'] = True
-                await update.message.reply_text("Ок, создаём ЛИЧНЫЙ дедлайн. Введите <b>предмет</b>.",
-                                                parse_mode='HTML')
-                context.user_data['deadline_flow_step'] = ADD_DEADLINE_FLOW['SUBJECT']
-            elif 'общ' in txt_lower:
-                flow_data['is_private'] = False
-                await update.message.reply_text("Ок, создаём ОБЩИЙ дедлайн. Введите <b>предмет</b>.", parse_mode='HTML')
-                context.user_data['deadline_flow_step'] = ADD_DEADLINE_FLOW['SUBJECT']
-            else:
-                await update.message.reply_text("Не понял. Введите 'Личный' или 'Общий'.")
+    async def _flow_is_private(self, update: Update, context: ContextTypes.DEFAULT_TYPE, txt: str) -> None:
+        """Шаг 1: личный или общий дедлайн"""
+        ud = context.user_data
+        flow_data = ud.setdefault('deadline_flow', {})
+        # Проверяем только начало ответа: длина ввода на проверку не влияет
+        txt_lower = txt[:8].lower()
+        if txt_lower.startswith(_PRIVATE_PREFIXES):
+            flow_data['is_private'] = True
+            await update.message.reply_text("Ок, создаём ЛИЧНЫЙ дедлайн. Введите <b>предмет</b>.",
+                                            parse_mode=ParseMode.HTML)
+            ud['state'] = STATE_ADD_SUBJECT
+        elif txt_lower.startswith(_PUBLIC_PREFIXES):
+            flow_data['is_private'] = False
+            await update.message.reply_text("Ок, создаём ОБЩИЙ дедлайн. Введите <b>предмет</b>.", parse_mode=ParseMode.HTML)
+            ud['state'] = STATE_ADD_SUBJECT
+        else:
+            await update.message.reply_text("Не понял. Введите 'Личный' или 'Общий'.")
+
+    async def _flow_subject(self, update: Update, context: ContextTypes.DEFAULT_TYPE, txt: str) -> None:
+        """Шаг 2: предмет"""
+        ud = context.user_data
+        flow_data = ud.setdefault('deadline_flow', {})
+        flow_data['subject'] = txt
+        await update.message.reply_text("Отлично! Теперь введите <b>название задания</b>.", parse_mode=ParseMode.HTML)
+        ud['state'] = STATE_ADD_TITLE
+
+    async def _flow_title(self, update: Update, context: ContextTypes.DEFAULT_TYPE, txt: str) -> None:
+        """Шаг 3: название задания"""
+        ud = context.user_data
+        flow_data = ud.setdefault('deadline_flow', {})
+        flow_data['title'] = txt
+        await update.message.reply_text("Отлично! Теперь введите <b>дату дедлайна</b> (формат YYYY-MM-DD HH:mm).",
+                                        parse_mode=ParseMode.HTML)
+        ud['state'] = STATE_ADD_DATE
+
+    async def _flow_date(self, update: Update, context: ContextTypes.DEFAULT_TYPE, txt: str) -> None:
+        """Шаг 4: дата дедлайна"""
+        ud = context.user_data
+        flow_data = ud.setdefault('deadline_flow', {})
+        date_test = parse_deadline_date(txt)
+        if date_test is None:
+            await update.message.reply_text("Неверный формат даты. Попробуйте ещё раз (YYYY-MM-DD HH:mm).")
+        elif date_test.date() < local_now().date():
+            await update.message.reply_text("❌ Дата уже прошла! Введите будущую дату (YYYY-MM-DD HH:mm).")
+        else:
+            flow_data['due_date_str'] = txt
+            flow_data['due_date'] = date_test
+            await update.message.reply_text("Хорошо! Теперь введите <b>комментарий/описание</b>.",
+                                            parse_mode=ParseMode.HTML)
+            ud['state'] = STATE_ADD_COMMENT
+
+    async def _flow_comment(self, update: Update, context: ContextTypes.DEFAULT_TYPE, txt: str) -> None:
+        """Шаг 5: описание; создает дедлайн"""
+        ud = context.user_data
+        flow_data = ud.setdefault('deadline_flow', {})
+        flow_data['description'] = txt
 
-        elif step == ADD_DEADLINE_FLOW['SUBJECT']:
-            flow_data['subject'] = txt
-            await update.message.reply_text("Отлично! Теперь введите <b>название задания</b>.", parse_mode='HTML')
-            context.user_data['deadline_flow_step'] = ADD_DEADLINE_FLOW['TITLE']
+        global deadlines
+        is_private = flow_data['is_private']
+        subject = flow_data['subject']
+        title = flow_data['title']
+        due_date_str = flow_data['due_date_str']
+        description = flow_data['description']
 
-        elif step == ADD_DEADLINE_FLOW['TITLE']:
-            flow_data['title'] = txt
-            await update.message.reply_text("Отлично! Теперь введите <b>дату дедлайна</b> (формат YYYY-MM-DD HH:mm).",
-                                            parse_mode='HTML')
-            context.user_data['deadline_flow_step'] = ADD_DEADLINE_FLOW['DATE']
+        try:
+            # Дата уже разобрана на шаге DATE
+            due_date = flow_data['due_date']
+            new_deadline_id = next_deadline_id()
+            created_by_id = update.effective_user.id
+            created_in_chat = update.effective_chat.id
+            author_mention = _author_mention(created_by_id, update.effective_user.full_name)
+
+            new_deadline = {
+                "deadline_id": new_deadline_id,
+                "title": title,
+                "subject": subject,
+                "description": description,
+                "due_date": due_date,
+                "is_private": is_private,
+                "created_by_id": created_by_id,
+                "created_in_chat": created_in_chat,
+                "author_name": update.effective_user.full_name  # Сохраняем имя автора
+            }
 
-        elif step == ADD_DEADLINE_FLOW['DATE']:
-            try:
-                date_test = datetime.strptime(txt, "%Y-%m-%d %H:%M")
-                if date_test.date() < datetime.now().date():
-                    await update.message.reply_text("❌ Дата уже прошла! Введите будущую дату (YYYY-MM-DD HH:mm).")
-                else:
-                    flow_data['due_date_str'] = txt
-                    await update.message.reply_text("Хорошо! Теперь введите <b>комментарий/описание</b>.",
-                                                    parse_mode='HTML')
-                    context.user_data['deadline_flow_step'] = ADD_DEADLINE_FLOW['COMMENT']
-            except ValueError:
-                await update.message.reply_text("Неверный формат даты. Попробуйте ещё раз (YYYY-MM-DD HH:mm).")
+            if not add_deadline(new_deadline):
+                ud['state'] = STATE_IDLE
+                ud['deadline_flow'] = {}
+                await update.message.reply_text("❗️ Такой дедлайн уже существует.")
+                return
+            log_deadline_added(new_deadline)
 
-        elif step == ADD_DEADLINE_FLOW['COMMENT']:
-            flow_data['description'] = txt
+            # Планируем напоминания для нового дедлайна
+            schedule_deadline_reminders(new_deadline)
 
-            global deadlines
-            is_private = flow_data['is_private']
-            subject = flow_data['subject']
-            title = flow_data['title']
-            due_date_str = flow_data['due_date_str']
-            description = flow_data['description']
+            msg = _DEADLINE_ADDED_TEMPLATE.format_map(new_deadline | {
+                'date_str': due_date_str,
+                'visibility': "(Личный)" if is_private else "(Общий)",
+                'author_mention': author_mention,
+            })
+            await update.message.reply_text(msg, parse_mode=ParseMode.HTML)
 
-            try:
-                due_date = datetime.strptime(due_date_str, "%Y-%m-%d %H:%M")
-                new_deadline_id = len(deadlines) + 1
-                created_by_id = update.effective_user.id
-                created_in_chat = update.effective_chat.id
-                author_mention = f'<a href="tg://user?id={created_by_id}">{update.effective_user.full_name}</a>'
-
-                new_deadline = {
-                    "deadline_id": new_deadline_id,
-                    "title": title,
-                    "subject": subject,
-                    "description": description,
-                    "due_date": due_date,
-                    "is_private": is_private,
-                    "created_by_id": created_by_id,
-                    "created_in_chat": created_in_chat,
-                    "author_name": update.effective_user.full_name  # Сохраняем имя автора
-                }
-
-                deadlines.append(new_deadline)
-                save_deadlines()
-
-                # Планируем напоминания для нового дедлайна
-                schedule_deadline_reminders(new_deadline)
-
-                visibility_emo = "(Личный)" if is_private else "(Общий)"
-                msg = (
-                    f"✅ <b>Дедлайн добавлен!</b>\n"
-                    f"ID: {new_deadline_id}\n"
-                    f"Предмет: {subject}\n"
-                    f"Задание: {title}\n"
-                    f"Дата: {due_date_str}\n"
-                    f"Тип: {visibility_emo}\n"
-                    f"Описание: {description}\n"
-                    f"Автор: {author_mention}"
-                )
-                await update.message.reply_text(msg, parse_mode='HTML')
-
-                if not is_private:
-                    global group_chat_id
-                    target_chat_id = group_chat_id if group_chat_id else created_in_chat
-                    msg_text = (
-                        f"⚠️ <b>Новый ОБЩИЙ дедлайн!</b>\n"
-                        f"Предмет: {subject}\n"
-                        f"Задание: {title}\n"
-                        f"Дата: {due_date_str}\n"
-                        f"Описание: {description}\n"
-                        f"Автор: {author_mention}"
-                    )
-                    try:
-                        # Отправляем уведомление в группу только если дедлайн был создан не в ней
-                        if update.effective_chat.type == Chat.PRIVATE:
-                            await context.bot.send_message(chat_id=target_chat_id, text=msg_text, parse_mode='HTML')
-                            logging.info(f"Отправлено уведомление в группу о новом дедлайне из личного чата")
-                    except Exception as e:
-                        logging.warning(f"Не удалось отправить уведомление в группу: {e}")
-
-                    # Отправляем уведомления другим пользователям в личку
-                    for uid in known_users:
-                        if uid != created_by_id:
-                            try:
-                                # Не отправляем уведомление тому, кто создал дедлайн
-                                await context.bot.send_message(
-                                    chat_id=uid,
-                                    text=f"(Общий дедлайн) {msg_text}",
-                                    parse_mode='HTML'
-                                )
-                            except Exception as e:
-                                logging.warning(f"Не удалось отправить ЛС user_id={uid}: {e}")
+            if not is_private:
+                await announce_public_deadline_added(update, context, new_deadline, due_date_str, author_mention)
 
-            except Exception as e:
-                logging.error(f"Ошибка финализации дедлайна: {e}")
-                await update.message.reply_text("❌ Произошла ошибка при добавлении дедлайна.")
+        except Exception as e:
+            log.error("Ошибка финализации дедлайна: %s", e)
+            await update.message.reply_text("❌ Произошла ошибка при добавлении дедлайна.")
 
-            context.user_data['deadline_flow_step'] = None
-            context.user_data['deadline_flow'] = {}
+        ud['state'] = STATE_IDLE
+        ud['deadline_flow'] = {}
 
     async def _deadline_remove_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE, txt: str) -> None:
-        step = context.user_data['remove_flow_step']
-        if step == REMOVE_DEADLINE_FLOW['ASK_ID']:
-            try:
-                deadline_id = int(txt)
-                found_index = None
-                global deadlines, group_chat_id
-                removed = None
-
-                for i, dl in enumerate(deadlines):
-                    if dl['deadline_id'] == deadline_id:
-                        found_index = i
-                        removed = dl
-                        break
-
-                if found_index is not None:
-                    # Отменяем все запланированные напоминания для удаляемого дедлайна
-                    cancel_deadline_reminders(deadline_id)
-                    
-                    deadlines.pop(found_index)
-                    save_deadlines()
-
-                    remover_mention = f'<a href="tg://user?id={update.effective_user.id}">{update.effective_user.full_name}</a>'
-
-                    # Сообщение в том же чате, где была вызвана команда
-                    await update.message.reply_text(
-                        f"❌ Дедлайн ID={deadline_id} удалён!\n"
-                        f"Предмет: {removed['subject']} / Задание: {removed['title']}\n"
-                        f"Удалил(а): {remover_mention}",
-                        parse_mode='HTML'
-                    )
+        try:
+            deadline_id = int(txt)
+            removed = remove_deadline(deadline_id)
 
-                    # Если дедлайн был общий, уведомим группу НЕЗАВИСИМО от места удаления
-                    if not removed['is_private']:
-                        target_chat_id = group_chat_id if group_chat_id else Config.CHAT_ID
-                        text_for_group = (
-                            f"⚠️ <b>Общий дедлайн удалён!</b>\n"
-                            f"ID: {deadline_id}\n"
-                            f"Предмет: {removed['subject']}\n"
-                            f"Задание: {removed['title']}\n"
-                            f"Дата: {removed['due_date'].strftime('%Y-%m-%d %H:%M')}\n"
-                            f"Удалил(а): {remover_mention}"
-                        )
-
-                        try:
-                            # Отправляем в группу
-                            await context.bot.send_message(
-                                chat_id=target_chat_id,
-                                text=text_for_group,
-                                parse_mode='HTML'
-                            )
-
-                            # Отправляем уведомление всем пользователям в личку
-                            for user_id in known_users:
-                                if user_id != update.effective_user.id:  # Не отправляем тому, кто удалил
-                                    try:
-                                        personal_msg = (
-                                                           f"❌ <b>Уведомление об удалении дедлайна</b>\n"
-                                                           f"{'➖' * 20}\n\n"
-                                                       ) + text_for_group
-
-                                        await context.bot.send_message(
-                                            chat_id=user_id,
-                                            text=personal_msg,
-                                            parse_mode='HTML'
-                                        )
-                                    except Exception as e:
-                                        logging.warning(f"Не удалось отправить ЛС об удалении user_id={user_id}: {e}")
-
-                        except Exception as e:
-                            logging.warning(f"Не удалось отправить сообщение об удалении в группу: {e}")
-                else:
-                    await update.message.reply_text(
-                        f"Нет дедлайна с таким ID: {deadline_id}"
-                    )
-            except ValueError:
-                await update.message.reply_text("Введите число (ID дедлайна).")
+            if removed is not None:
+                # Отменяем все запланированные напоминания для удаляемого дедлайна
+                cancel_deadline_reminders(deadline_id)
+                log_deadline_removed(deadline_id)
+
+                remover_mention = _author_mention(update.effective_user.id, update.effective_user.full_name)
+
+                # Сообщение в том же чате, где была вызвана команда
+                await update.message.reply_text(
+                    _DEADLINE_REMOVED_REPLY_TEMPLATE.format_map(removed | {'remover_mention': remover_mention}),
+                    parse_mode=ParseMode.HTML
+                )
+
+                # Если дедлайн был общий, уведомим группу НЕЗАВИСИМО от места удаления
+                if not removed['is_private']:
+                    await announce_public_deadline_removed(update, context, removed, remover_mention)
+            else:
+                await update.message.reply_text(
+                    f"Нет дедлайна с таким ID: {deadline_id}"
+                )
+        except ValueError:
+            await update.message.reply_text("Введите число (ID дедлайна).")
+
+        context.user_data['state'] = STATE_IDLE
 
-            context.user_data['remove_flow_step'] = None
+    async def _diploma_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE, txt: str) -> None:
+        await self._calc_average(update, context, txt, is_diploma=True)
+
+    async def _subject_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE, txt: str) -> None:
+        await self._calc_average(update, context, txt, is_diploma=False)
+
+    # Состояние диалога -> обработчик следующего текстового сообщения
+    _STATE_HANDLERS = {
+        STATE_ADD_IS_PRIVATE: _flow_is_private,
+        STATE_ADD_SUBJECT: _flow_subject,
+        STATE_ADD_TITLE: _flow_title,
+        STATE_ADD_DATE: _flow_date,
+        STATE_ADD_COMMENT: _flow_comment,
+        STATE_REMOVE_ASK_ID: _deadline_remove_handler,
+        STATE_DIPLOMA: _diploma_input,
+        STATE_SUBJECT: _subject_input,
+    }
 
     async def _calc_average(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str,
                             is_diploma: bool) -> None:
         try:
             # Разделяем строку на числа, игнорируя все нечисловые символы
-            raw = [x.strip() for x in text.replace(',', ' ').split()]
+            raw = text.replace(',', ' ').split()
             if not raw:
                 await update.message.reply_text("❌ Нет оценок. Введите числа через пробел.")
                 return
 
-            # Преобразуем строки в числа
-            arr = []
-            for num in raw:
-                try:
-                    n = float(num)
-                    if 1 <= n <= 10:  # Изменено для 10-балльной системы
-                        arr.append(n)
-                    else:
-                        await update.message.reply_text(f"❌ Оценка {n} вне диапазона 1-10!")
-                        return
-                except ValueError:
-                    continue  # Пропускаем нечисловые значения
+            arr, out_of_range = parse_grades(raw)
+            if out_of_range is not None:
+                await update.message.reply_text(f"❌ Оценка {out_of_range} вне диапазона 1-10!")
+                return
 
             if not arr:
                 await update.message.reply_text("❌ Не найдено допустимых оценок (1-10)!")
@@ -1291,20 +2229,6 @@ class CommandHandlers:
             avg = sum(arr) / len(arr)
 
             # Добавляем оценку словами
-            def get_grade_word(avg):
-                if avg >= 9.5:
-                    return "Отлично с отличием"
-                elif avg >= 8.5:
-                    return "Отлично"
-                elif avg >= 7.0:
-                    return "Очень хорошо"
-                elif avg >= 6.0:
-                    return "Хорошо"
-                elif avg >= 4.0:
-                    return "Удовлетворительно"
-                else:
-                    return "Неудовлетворительно"
-
             grade_word = get_grade_word(avg)
 
             if is_diploma:
@@ -1324,12 +2248,12 @@ class CommandHandlers:
                     f"📝 Оценка: <b>{grade_word}</b>"
                 )
 
-            await update.message.reply_text(response, parse_mode='HTML')
+            await update.message.reply_text(response, parse_mode=ParseMode.HTML)
         except Exception as e:
-            logging.error(f"Ошибка при расчете среднего балла: {e}")
+            log.error("Ошибка при расчете среднего балла: %s", e)
             await update.message.reply_text("❌ Произошла ошибка при расчете.")
         finally:
-            context.user_data['state'] = None  # Сбрасываем состояние
+            context.user_data['state'] = STATE_IDLE  # Сбрасываем состояние
 
     async def _call_action(self, update: Update, context: ContextTypes.DEFAULT_TYPE, action_type: str) -> None:
         user_id = str(update.effective_user.id)
@@ -1349,49 +2273,29 @@ class CommandHandlers:
                 await send_message("❗️ Нельзя так часто, подождите неделю.")
             return
             
-        desc_map = {
-            'beer': "пойти пить пиво",
-            'board_games': "поиграть в настолки",
-            'cinema': "сходить в кино",
-            'walk': "пойти гулять"
-        }
-        desc = desc_map.get(action_type, "что-то сделать")
+        desc = _ACTION_DESC.get(action_type, "что-то сделать")
         text = f"{update.effective_user.first_name} предлагает {desc}! Кто присоединится?"
 
-        sent_count = 0
-        for uid in self.user_manager.get_users():
-            if uid != user_id:
-                try:
-                    await context.bot.send_message(chat_id=uid, text=text)
-                    sent_count += 1
-                except Exception as e:
-                    logging.error(f"Ошибка рассылки user_id={uid}: {e}")
+        # Тот же снимок, что и у остальных рассылок
+        recipients = known_users - {update.effective_user.id}
 
         self.action_manager.update_action_time(user_id, action_type)
-        activity_name = desc_map.get(action_type, "действие").split(" ")[-1]
+        activity_name = _ACTIVITY_NAMES.get(action_type, "действие")
         
+        # Сначала отвечаем, сама рассылка идет в фоне
         if update.callback_query:
-            await send_message(chat_id=chat_id, text=f"✅ Приглашение на {activity_name} отправлено всем! ({sent_count} получателей)")
+            await send_message(chat_id=chat_id, text=f"✅ Приглашение на {activity_name} отправляется всем! ({len(recipients)} получателей)")
         else:
-            await send_message(f"✅ Приглашение на {activity_name} отправлено всем! ({sent_count} получателей)")
+            await send_message(f"✅ Приглашение на {activity_name} отправляется всем! ({len(recipients)} получателей)")
+
+        context.application.create_task(broadcast(context.bot, recipients, text))
 
     async def menu_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         # Используем inline-кнопки везде (и в личке, и в группе)
-        kb = [
-            [InlineKeyboardButton("🎓 Средний балл диплома", callback_data="calc_diploma"),
-             InlineKeyboardButton("📚 Балл по предмету", callback_data="calc_subject")],
-            [InlineKeyboardButton("📞 Контакты", callback_data="contacts"),
-             InlineKeyboardButton("🗓 Дедлайны", callback_data="deadlines")],
-            [InlineKeyboardButton("🍺 Позвать пить пиво", callback_data="call_beer"),
-             InlineKeyboardButton("🎲 Позвать в настолки", callback_data="call_board_games")],
-            [InlineKeyboardButton("🎥 Позвать в кино", callback_data="call_cinema"),
-             InlineKeyboardButton("🚶 Позвать гулять", callback_data="call_walk")],
-            [InlineKeyboardButton("💳 Оплатить учебу", callback_data="pay_education")]
-        ]
         await update.message.reply_text(
             "🔸 <b>Главное меню</b>\nВыберите действие:",
-            reply_markup=InlineKeyboardMarkup(kb),
-            parse_mode='HTML'
+            reply_markup=_MAIN_MENU_KB,
+            parse_mode=ParseMode.HTML
         )
 
 
@@ -1425,13 +2329,13 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
 
         "❗️ <b>Важно</b>: Личные дедлайны видны только создателю"
     )
-    await update.message.reply_text(help_text, parse_mode='HTML')
+    await update.message.reply_text(help_text, parse_mode=ParseMode.HTML)
 
 
 async def set_group_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     global group_chat_id
     chat = update.effective_chat
-    if chat.type not in (Chat.GROUP, Chat.SUPERGROUP):
+    if chat.type not in _GROUP_TYPES:
         await update.message.reply_text("Команду /set_group нужно вызывать внутри группы, где бот является админом!")
         return
 
@@ -1472,20 +2376,20 @@ async def add_deadline_command(update: Update, context: ContextTypes.DEFAULT_TYP
         description = " ".join(args[4:])
 
         is_private = (is_private_str == "true")
-        try:
-            due_date = datetime.strptime(due_date_str, "%Y-%m-%d %H:%M")
-        except ValueError:
-            # Если не указано время, используем конец дня
-            due_date = datetime.strptime(due_date_str, "%Y-%m-%d").replace(hour=23, minute=59)
+        # Если не указано время, используется конец дня
+        due_date = parse_deadline_date(due_date_str, require_time=False)
+        if due_date is None:
+            await update.message.reply_text("❌ Неверный формат даты! Используй YYYY-MM-DD или YYYY-MM-DD HH:mm.")
+            return
 
-        if due_date < datetime.now():
+        if due_date < local_now():
             await update.message.reply_text("❌ Дата уже прошла! Выберите будущее время.")
             return
 
-        new_deadline_id = len(deadlines) + 1
+        new_deadline_id = next_deadline_id()
         created_by_id = update.effective_user.id
         created_in_chat = update.effective_chat.id
-        author_mention = f'<a href="tg://user?id={created_by_id}">{update.effective_user.full_name}</a>'
+        author_mention = _author_mention(created_by_id, update.effective_user.full_name)
 
         new_deadline = {
             "deadline_id": new_deadline_id,
@@ -1498,58 +2402,26 @@ async def add_deadline_command(update: Update, context: ContextTypes.DEFAULT_TYP
             "created_in_chat": created_in_chat,
             "author_name": update.effective_user.full_name  # Сохраняем имя автора
         }
-        deadlines.append(new_deadline)
-        save_deadlines()
+        if not add_deadline(new_deadline):
+            await update.message.reply_text("❗️ Такой дедлайн уже существует.")
+            return
+        log_deadline_added(new_deadline)
 
         # Планируем напоминания для нового дедлайна
         schedule_deadline_reminders(new_deadline)
 
-        msg = (
-            f"✅ <b>Дедлайн добавлен!</b>\n"
-            f"ID: {new_deadline_id}\n"
-            f"Предмет: {subject}\n"
-            f"Задание: {title}\n"
-            f"Дата: {due_date_str}\n"
-            f"Тип: {'(Личный)' if is_private else '(Общий)'}\n"
-            f"Описание: {description}\n"
-            f"Автор: {author_mention}"
-        )
-        await update.message.reply_text(msg, parse_mode='HTML')
+        msg = _DEADLINE_ADDED_TEMPLATE.format_map(new_deadline | {
+            'date_str': due_date_str,
+            'visibility': "(Личный)" if is_private else "(Общий)",
+            'author_mention': author_mention,
+        })
+        await update.message.reply_text(msg, parse_mode=ParseMode.HTML)
 
         if not is_private:
-            global group_chat_id
-            target_chat_id = group_chat_id if group_chat_id else created_in_chat
-            msg_text = (
-                f"⚠️ <b>Новый ОБЩИЙ дедлайн!</b>\n"
-                f"Предмет: {subject}\n"
-                f"Задание: {title}\n"
-                f"Дата: {due_date_str}\n"
-                f"Описание: {description}\n"
-                f"Автор: {author_mention}"
-            )
-            try:
-                # Отправляем уведомление в группу только если дедлайн был создан не в ней
-                if update.effective_chat.type == Chat.PRIVATE:
-                    await context.bot.send_message(chat_id=target_chat_id, text=msg_text, parse_mode='HTML')
-                    logging.info(f"Отправлено уведомление в группу о новом дедлайне из личного чата")
-            except Exception as e:
-                logging.warning(f"Не удалось отправить уведомление в группу: {e}")
-
-            # Отправляем уведомления другим пользователям в личку
-            for uid in known_users:
-                if uid != created_by_id:
-                    try:
-                        # Не отправляем уведомление тому, кто создал дедлайн
-                        await context.bot.send_message(
-                            chat_id=uid,
-                            text=f"(Общий дедлайн) {msg_text}",
-                            parse_mode='HTML'
-                        )
-                    except Exception as e:
-                        logging.warning(f"Не удалось отправить ЛС user_id={uid}: {e}")
+            await announce_public_deadline_added(update, context, new_deadline, due_date_str, author_mention)
 
     except Exception as e:
-        logging.error(f"Ошибка при добавлении дедлайна: {e}")
+        log.error("Ошибка при добавлении дедлайна: %s", e)
         await update.message.reply_text("❌ Произошла ошибка при добавлении дедлайна.")
 
 
@@ -1563,97 +2435,43 @@ async def list_deadlines_command(update: Update, context: ContextTypes.DEFAULT_T
             await update.message.reply_text("Пока нет ни одного дедлайна!")
             return
             
-        # Определяем текущую дату для сравнения
-        current_date = datetime.now()
-        
-        # Фильтруем только актуальные дедлайны
-        filtered_deadlines = []
-        
-        for d in deadlines:
-            # Пропускаем личные дедлайны других пользователей
-            if d["is_private"] and d["created_by_id"] != user_id:
-                continue
-                
-            # Определяем, истек ли срок дедлайна
-            is_expired = d["due_date"] < current_date
-            
-            # Добавляем только неистекшие дедлайны
-            if not is_expired:
-                filtered_deadlines.append(d)
+        # Только актуальные дедлайны, без личных дедлайнов других пользователей
+        filtered_deadlines = visible_deadlines(user_id, False, update_now_ts())
         
         if not filtered_deadlines:
             await update.message.reply_text("Нет актуальных дедлайнов для просмотра.")
             return
             
-        # Формируем сообщение с заголовком
-        msg = f"📋 <b>Список актуальных дедлайнов</b>:\n\n"
-        
-        # Отправляем первое сообщение с заголовком
-        await update.message.reply_text(msg, parse_mode='HTML')
-        
-        # Отправляем каждый дедлайн отдельным сообщением
-        for d in filtered_deadlines:
-            try:
-                date_str = d["due_date"].strftime("%Y-%m-%d %H:%M")
-                try:
-                    author_name = d.get('author_name', 'Неизвестный')
-                    author_mention = f"<a href=\"tg://user?id={d['created_by_id']}\">{author_name}</a>"
-                except:
-                    author_mention = "Неизвестный"
-                
-                deadline_msg = (
-                    f"📌 <b>ID: {d['deadline_id']}</b>\n"
-                    f"📕 Предмет: {d['subject']}\n"
-                    f"📝 Задание: {d['title']}\n"
-                    f"📅 Дата: {date_str}\n"
-                    f"💬 Описание: {d['description']}\n"
-                    f"🔒 Личный: {'Да' if d['is_private'] else 'Нет'}\n"
-                    f"👤 Автор: {author_mention}"
-                )
-                
-                # Отправляем отдельное сообщение для каждого дедлайна
-                await context.bot.send_message(
-                    chat_id=update.effective_chat.id,
-                    text=deadline_msg,
-                    parse_mode='HTML'
-                )
-            except Exception as e:
-                logging.error(f"Ошибка при отправке дедлайна: {e}")
-                # Продолжаем с другими дедлайнами в случае ошибки
+        # Первая страница списка; остальные — по кнопкам
+        text, keyboard = _render_deadline_page(filtered_deadlines, "actual", 0)
+        await update.message.reply_text(text, parse_mode=ParseMode.HTML, reply_markup=keyboard)
     except Exception as e:
-        logging.error(f"Ошибка в list_deadlines_command: {e}")
+        log.error("Ошибка в list_deadlines_command: %s", e)
         await update.message.reply_text("❌ Произошла ошибка при отображении дедлайнов.")
 
 
 ################################################################################
-#                    APScheduler: check_deadlines JOB                          #
+#                    APScheduler: daily birthdays JOB                          #
 ################################################################################
 
-scheduler = BackgroundScheduler(timezone="Asia/Yekaterinburg")
+# Ежедневная задача только поздравляет с днем рождения: напоминания о дедлайнах
+# отправляет dispatch_deadline_reminders. Запускается тем же deadline_scheduler
+CHECK_BIRTHDAYS_JOB_ID = "check_birthdays"
 
 
-def check_deadlines():
-    """Проверяет дни рождения и отправляет поздравления"""
-    logging.info(f"Запущена плановая проверка дней рождения...")
-    
+async def check_birthdays_job(bot: Bot):
+    """Проверяет дни рождения и отправляет поздравления.
+
+    bot — бот приложения (передается в args задачи): его пул соединений уже
+    прогрет, новый Bot и новый цикл событий не создаются.
+    """
+    log.info("Запущена плановая проверка дней рождения...")
+
     try:
-        async def send_notifications():
-            # Проверяем дни рождения
-            try:
-                bot = Bot(token=Config.BOT_TOKEN)
-                await check_birthdays(bot)
-            except Exception as e:
-                logging.error(f"Ошибка при проверке дней рождения: {e}")
-                import traceback
-                logging.error(traceback.format_exc())
-        
-        # Запускаем асинхронную функцию из неасинхронного кода
-        asyncio.run(send_notifications())
+        await check_birthdays(bot)
         return "Проверка дней рождения завершена"
     except Exception as e:
-        logging.error(f"Общая ошибка в проверке дней рождения: {e}")
-        import traceback
-        logging.error(traceback.format_exc())
+        log.exception("Общая ошибка в проверке дней рождения: %s", e)
         return f"Ошибка: {e}"
 
 
@@ -1670,20 +2488,76 @@ class StudentBot:
             Config.DATA_DIR.mkdir(parents=True, exist_ok=True)
             
             # Инициализация менеджеров
-            self.user_manager = UserManager(Config.USERS_FILE)
+            self.user_manager = UserManager(Config.USERS_FILE, legacy_file=Config.LEGACY_USERS_FILE)
             self.action_manager = ActionManager(Config.ACTIONS_FILE)
             self.cmd_handlers = CommandHandlers(
                 self.user_manager,
                 self.action_manager
             )
+            self._flush_task = None
             
-            logging.info("StudentBot успешно инициализирован")
+            log.info("StudentBot успешно инициализирован")
         except Exception as e:
-            logging.critical(f"Ошибка при инициализации StudentBot: {e}")
-            import traceback
-            logging.critical(traceback.format_exc())
+            log.critical("Ошибка при инициализации StudentBot: %s", e, exc_info=True)
             raise
 
+    async def _post_init(self, app):
+        """Выполняется в цикле событий приложения перед началом опроса"""
+        # Python 3.12+: задача выполняется сразу до первого await, и короткие
+        # корутины завершаются без постановки в очередь цикла событий
+        if hasattr(asyncio, 'eager_task_factory'):
+            asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+
+        # Напоминания о дедлайнах используют бота приложения и его пул соединений
+        register_application_bot(app.bot)
+        if not deadline_scheduler.running:
+            deadline_scheduler.start()
+
+        # Дедлайны читаются в отдельном потоке, чтобы не задерживать запуск
+        await load_deadlines_async()
+        restore_deadline_reminders()
+        # Проверка дней рождения каждый день в 8:00
+        deadline_scheduler.add_job(
+            check_birthdays_job,
+            "cron", hour=8, minute=0,
+            args=[app.bot],
+            id=CHECK_BIRTHDAYS_JOB_ID,
+            name="Проверка дней рождения",
+            replace_existing=True,
+            misfire_grace_time=3600,
+            coalesce=True
+        )
+        deadline_scheduler.add_job(
+            compact_deadlines_async,
+            trigger='interval',
+            seconds=DEADLINES_COMPACT_INTERVAL.total_seconds(),
+            id=DEADLINES_COMPACT_JOB_ID,
+            replace_existing=True,
+            coalesce=True
+        )
+
+        self.user_manager.compact_if_needed()
+
+        # Изменения действий пишутся на диск пачками
+        self._flush_task = asyncio.create_task(flush_periodically(self.action_manager, deadline_ops))
+
+        await self._set_commands(app)
+
+    async def _post_shutdown(self, app):
+        """Останавливает фоновую запись и сохраняет оставшиеся изменения"""
+        # Диспетчер напоминаний и другие задачи не должны срабатывать, пока бот закрывается
+        if deadline_scheduler.running:
+            deadline_scheduler.shutdown(wait=False)
+
+        # Под замком журнала фоновая дозапись не может писать в файл в потоке,
+        # поэтому после отмены задачи журнал не изменится за спиной у compact_deadlines
+        async with deadline_ops.lock:
+            if self._flush_task is not None:
+                self._flush_task.cancel()
+                self._flush_task = None
+            self.action_manager.flush()
+            compact_deadlines()
+
     async def _set_commands(self, app):
         try:
             await app.bot.set_my_commands([
@@ -1697,28 +2571,23 @@ class StudentBot:
                 BotCommand("subject", "Средний балл по предмету"),
                 BotCommand("remove_deadline", "Удалить дедлайн")
             ])
-            logging.info("Команды бота успешно настроены")
+            log.info("Команды бота успешно настроены")
         except Exception as e:
-            logging.error(f"Ошибка при настройке команд бота: {e}")
+            log.error("Ошибка при настройке команд бота: %s", e)
             raise
         
     # Обработчик ошибок для бота
     async def error_handler(self, update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
         """Обрабатывает ошибки, возникающие в хендлерах"""
-        logging.error("Произошла ошибка при обработке обновления:")
-        logging.error(f"Ошибка: {context.error}")
-        
-        # Добавляем полную информацию об ошибке
-        import traceback
-        traceback_str = ''.join(traceback.format_tb(context.error.__traceback__))
-        logging.error(f"Стек вызовов:\n{traceback_str}")
+        # Стек вызовов добавляет сам logging через exc_info
+        log.error("Произошла ошибка при обработке обновления: %s", context.error, exc_info=context.error)
         
         # Если произошла ошибка в обработчике callback_query
         if update and update.callback_query:
             try:
                 await update.callback_query.answer("Произошла ошибка при обработке запроса. Пожалуйста, попробуйте снова.")
             except Exception as e:
-                logging.error(f"Не удалось отправить сообщение об ошибке через callback_query: {e}")
+                log.error("Не удалось отправить сообщение об ошибке через callback_query: %s", e)
         
         # Если произошла ошибка при обработке сообщения
         elif update and update.effective_chat:
@@ -1728,31 +2597,18 @@ class StudentBot:
                     text="❌ Произошла ошибка при обработке запроса. Пожалуйста, попробуйте снова."
                 )
             except Exception as e:
-                logging.error(f"Не удалось отправить сообщение об ошибке: {e}")
+                log.error("Не удалось отправить сообщение об ошибке: %s", e)
 
     def run(self):
-        # Настраиваем логирование
-        logging.basicConfig(format=Config.LOG_FORMAT, level=Config.LOG_LEVEL,
-                            handlers=[
-                                logging.StreamHandler(),
-                                logging.FileHandler("bot.log", encoding="utf-8")
-                            ])
-        
         try:
-            # Загружаем данные
-            load_deadlines()
-            
-            # Планируем задачу проверки дедлайнов и дней рождения каждый день в 8:00
-            scheduler.add_job(check_deadlines, "cron", hour=8, minute=0, 
-                             misfire_grace_time=3600, coalesce=True,
-                             name="Проверка дней рождения")
-
-            scheduler.start()
-
             application = (
                 ApplicationBuilder()
                 .token(self.token)
-                .post_init(self._set_commands)
+                # Размеры пулов — как у ApplicationBuilder по умолчанию
+                .request(OrjsonRequest(connection_pool_size=256))
+                .get_updates_request(OrjsonRequest())
+                .post_init(self._post_init)
+                .post_shutdown(self._post_shutdown)
                 .build()
             )
 
@@ -1761,12 +2617,12 @@ class StudentBot:
             # Добавляем CommandHandlers в bot_data для доступа из callback-функций
             application.bot_data['command_handlers'] = self.cmd_handlers
             
-            # Восстанавливаем напоминания для существующих дедлайнов
-            restore_deadline_reminders()
-            
             # Добавляем обработчик ошибок
             application.add_error_handler(self.error_handler)
             
+            # Засекаем время апдейта раньше всех остальных обработчиков
+            application.add_handler(TypeHandler(Update, _stamp_update_time), group=-100)
+
             # Основные команды.
             application.add_handler(CommandHandler("start", self.cmd_handlers.start))
             application.add_handler(CommandHandler("menu", self.cmd_handlers.menu_command))
@@ -1778,21 +2634,8 @@ class StudentBot:
             application.add_handler(CommandHandler("subject", self.cmd_handlers.subject_cmd))
             application.add_handler(CommandHandler("remove_deadline", self._remove_deadline_cmd))
             
-            # Обработчики callback-кнопок (важно: размещаем их ПЕРЕД обработчиками текста)
-            application.add_handler(CallbackQueryHandler(
-                CallbackHandlers.menu_callback,
-                pattern='^(calc_diploma|calc_subject|contacts|deadlines|call_beer|call_board_games|call_cinema|call_walk|pay_education)$'
-            ))
-
-            application.add_handler(CallbackQueryHandler(
-                CallbackHandlers.contact_callback,
-                pattern='^(contact_1|contact_2|main_menu)$'
-            ))
-
-            application.add_handler(CallbackQueryHandler(
-                deadline_menu_callback,
-                pattern='^(deadline_add|deadline_list|deadline_list_actual|deadline_list_expired|deadline_group|deadline_help|deadline_remove)$'
-            ))
+            # Обработчик callback-кнопок (важно: размещаем его ПЕРЕД обработчиками текста)
+            application.add_handler(CallbackQueryHandler(route_callback))
 
             # Обработчик для текста (и в личке, и в группе)
             application.add_handler(MessageHandler(
@@ -1802,24 +2645,19 @@ class StudentBot:
             
             # Обработчик меню-кнопок
             application.add_handler(MessageHandler(
-                filters.TEXT & (filters.COMMAND | filters.Regex(
-                    r'^(🎓 Средний балл диплома|📞 Контакты администрации|📚 Балл по предмету|🍺 Позвать пить пиво|🎲 Позвать в настолки|🎥 Позвать в кино|🚶 Позвать гулять|🗓 Дедлайны)$'
-                )) & (filters.ChatType.PRIVATE | filters.ChatType.GROUP | filters.ChatType.SUPERGROUP),
+                filters.TEXT & (filters.COMMAND | filters.Regex(_MENU_BUTTONS_RE)) & (filters.ChatType.PRIVATE | filters.ChatType.GROUP | filters.ChatType.SUPERGROUP),
                 self.cmd_handlers.handle_menu
             ))
 
-            logging.info("Бот запущен и готов к работе!")
+            log.info("Бот запущен и готов к работе!")
             application.run_polling(allowed_updates=Update.ALL_TYPES,
                                   drop_pending_updates=True,
                                   close_loop=False)
             
         except Exception as e:
-            logging.critical(f"Критическая ошибка при запуске бота: {e}")
-            import traceback
-            logging.critical(traceback.format_exc())
+            log.critical("Критическая ошибка при запуске бота: %s", e, exc_info=True)
             # Пытаемся перезапустить бот при критических ошибках
-            logging.info("Перезапуск бота через 5 секунд...")
-            import time
+            log.info("Перезапуск бота через 5 секунд...")
             time.sleep(5)
             self.run()
 
@@ -1830,72 +2668,24 @@ class StudentBot:
         
         try:
             deadline_id = int(context.args[0])
-            found_index = None
-            global deadlines, group_chat_id
-            removed = None
-
-            for i, dl in enumerate(deadlines):
-                if dl['deadline_id'] == deadline_id:
-                    found_index = i
-                    removed = dl
-                    break
+            removed = remove_deadline(deadline_id)
 
-            if found_index is not None:
+            if removed is not None:
                 # Отменяем все запланированные напоминания для удаляемого дедлайна
                 cancel_deadline_reminders(deadline_id)
-                
-                deadlines.pop(found_index)
-                save_deadlines()
+                log_deadline_removed(deadline_id)
 
-                remover_mention = f'<a href="tg://user?id={update.effective_user.id}">{update.effective_user.full_name}</a>'
+                remover_mention = _author_mention(update.effective_user.id, update.effective_user.full_name)
 
                 # Сообщение в том же чате, где была вызвана команда
                 await update.message.reply_text(
-                    f"❌ Дедлайн ID={deadline_id} удалён!\n"
-                    f"Предмет: {removed['subject']} / Задание: {removed['title']}\n"
-                    f"Удалил(а): {remover_mention}",
-                    parse_mode='HTML'
+                    _DEADLINE_REMOVED_REPLY_TEMPLATE.format_map(removed | {'remover_mention': remover_mention}),
+                    parse_mode=ParseMode.HTML
                 )
 
                 # Если дедлайн был общий, уведомим группу НЕЗАВИСИМО от места удаления
                 if not removed['is_private']:
-                    target_chat_id = group_chat_id if group_chat_id else Config.CHAT_ID
-                    text_for_group = (
-                        f"⚠️ <b>Общий дедлайн удалён!</b>\n"
-                        f"ID: {deadline_id}\n"
-                        f"Предмет: {removed['subject']}\n"
-                        f"Задание: {removed['title']}\n"
-                        f"Дата: {removed['due_date'].strftime('%Y-%m-%d %H:%M')}\n"
-                        f"Удалил(а): {remover_mention}"
-                    )
-
-                    try:
-                        # Отправляем в группу
-                        await context.bot.send_message(
-                            chat_id=target_chat_id,
-                            text=text_for_group,
-                            parse_mode='HTML'
-                        )
-
-                        # Отправляем уведомление всем пользователям в личку
-                        for user_id in known_users:
-                            if user_id != update.effective_user.id:  # Не отправляем тому, кто удалил
-                                try:
-                                    personal_msg = (
-                                                       f"❌ <b>Уведомление об удалении дедлайна</b>\n"
-                                                       f"{'➖' * 20}\n\n"
-                                                   ) + text_for_group
-
-                                    await context.bot.send_message(
-                                        chat_id=user_id,
-                                        text=personal_msg,
-                                        parse_mode='HTML'
-                                    )
-                                except Exception as e:
-                                    logging.warning(f"Не удалось отправить ЛС об удалении user_id={user_id}: {e}")
-
-                    except Exception as e:
-                        logging.warning(f"Не удалось отправить сообщение об удалении в группу: {e}")
+                    await announce_public_deadline_removed(update, context, removed, remover_mention)
             else:
                 await update.message.reply_text(
                     f"Нет дедлайна с таким ID: {deadline_id}"
@@ -1903,7 +2693,8 @@ class StudentBot:
         except ValueError:
             await update.message.reply_text("Нужно ввести число (ID).")
 
-        context.user_data['remove_flow_step'] = None
+        if context.user_data.get('state') == STATE_REMOVE_ASK_ID:
+            context.user_data['state'] = STATE_IDLE
 
 
 ################################################################################
@@ -1915,13 +2706,17 @@ def main():
     try:
         Config.validate()
     except ValueError as e:
-        logging.critical(f"Ошибка конфигурации: {e}")
+        log.critical("Ошибка конфигурации: %s", e)
         print(f"❌ Ошибка конфигурации: {e}")
         print("📝 Создайте файл .env на основе .env.example")
         return
     
-    # Настраиваем логирование
-    logging.basicConfig(format=Config.LOG_FORMAT, level=Config.LOG_LEVEL)
+    # Настраиваем логирование. Один раз: повторный basicConfig ничего не меняет
+    logging.basicConfig(format=Config.LOG_FORMAT, level=Config.LOG_LEVEL,
+                        handlers=[
+                            logging.StreamHandler(),
+                            logging.FileHandler("bot.log", encoding="utf-8")
+                        ])
     
     # Создаем необходимые директории
     Config.DATA_DIR.mkdir(parents=True, exist_ok=True)
@@ -1932,22 +2727,25 @@ def main():
         excel_path = str(json_path).replace('.json', '.xlsx')
         
         if not os.path.exists(json_path) and os.path.exists(excel_path):
-            logging.info(f"Конвертируем данные о днях рождения из Excel в JSON...")
+            log.info("Конвертируем данные о днях рождения из Excel в JSON...")
             if convert_excel_to_json(excel_path, json_path):
-                logging.info(f"Конвертация успешно завершена")
+                log.info("Конвертация успешно завершена")
             else:
-                logging.error(f"Не удалось конвертировать данные о днях рождения")
-        
-        # Загружаем дедлайны
-        load_deadlines()
+                log.error("Не удалось конвертировать данные о днях рождения")
         
+        # uvloop быстрее стандартного цикла событий; на Windows его нет
+        try:
+            import uvloop
+            uvloop.install()
+            log.info("Используется цикл событий uvloop")
+        except ImportError:
+            pass
+
         # Создаем и запускаем бота
         bot = StudentBot(Config.BOT_TOKEN)
         bot.run()
     except Exception as e:
-        logging.critical(f"Критическая ошибка при запуске приложения: {e}")
-        import traceback
-        logging.critical(traceback.format_exc())
+        log.critical("Критическая ошибка при запуске приложения: %s", e, exc_info=True)
 
 
 if __name__ == "__main__":
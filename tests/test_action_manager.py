@@ -18,4 +18,43 @@ def test_update_and_block_action(tmp_action_file):
     user_id = "user1"
     action = "beer"
     manager.update_action_time(user_id, action)
-    assert not manager.can_perform_action(user_id, action)
\ No newline at end of file
+    assert not manager.can_perform_action(user_id, action)
+
+def test_update_is_written_on_flush(tmp_action_file):
+    manager = ActionManager(tmp_action_file)
+    manager.update_action_time("user1", "beer")
+    manager.flush()
+    reloaded = ActionManager(tmp_action_file)
+    assert not reloaded.can_perform_action("user1", "beer")
+
+def test_update_is_written_on_async_flush(tmp_action_file):
+    import asyncio
+    manager = ActionManager(tmp_action_file)
+    manager.update_action_time("user1", "beer")
+    asyncio.run(manager.flush_async())
+    reloaded = ActionManager(tmp_action_file)
+    assert not reloaded.can_perform_action("user1", "beer")
+
+@pytest.mark.parametrize("use_async", [False, True])
+def test_failed_flush_is_retried(tmp_action_file, monkeypatch, use_async):
+    import asyncio
+    from Open_Source import Database
+    manager = ActionManager(tmp_action_file)
+    manager.update_action_time("user1", "beer")
+
+    def flush():
+        if use_async:
+            asyncio.run(manager.flush_async())
+        else:
+            manager.flush()
+
+    write_atomic = Database.write_atomic
+    def failing_write(path, payload):
+        raise OSError("disk full")
+    monkeypatch.setattr(Database, "write_atomic", staticmethod(failing_write))
+    flush()
+    monkeypatch.setattr(Database, "write_atomic", staticmethod(write_atomic))
+    flush()
+
+    reloaded = ActionManager(tmp_action_file)
+    assert not reloaded.can_perform_action("user1", "beer")
@@ -0,0 +1,33 @@
+import pytest
+import json
+from Open_Source import Config, load_birthdays, build_birthday_index
+
+@pytest.fixture
+def birthdays_file(monkeypatch, tmp_path):
+    test_file = tmp_path / "happy.json"
+    sample = [
+        {"фамилия": "Иванов", "имя": "Иван", "дата рождения": "2001-10-27"},
+        {"фамилия": "Петрова", "имя": "Анна", "дата рождения": "27 октября"},
+        {"фамилия": "Сидоров", "имя": "Петр", "дата рождения": "05.03.2002"},
+        {"фамилия": "Без", "имя": "Даты", "дата рождения": ""}
+    ]
+    test_file.write_text(json.dumps(sample, ensure_ascii=False), encoding="utf-8")
+    monkeypatch.setattr(Config, "BIRTHDAYS_FILE", test_file)
+    return test_file
+
+def test_load_birthdays_parses_dates(birthdays_file):
+    birthdays = load_birthdays()
+    assert (10, 27, "Иванов Иван") in birthdays
+    assert (3, 5, "Сидоров Петр") in birthdays
+    assert len(birthdays) == 3
+
+def test_birthday_index_groups_by_day(birthdays_file):
+    index = build_birthday_index(load_birthdays())
+    assert index[(10, 27)] == ["Иванов Иван", "Петрова Анна"]
+    assert (1, 1) not in index
+
+def test_load_birthdays_uses_cache_until_file_changes(birthdays_file):
+    first = load_birthdays()
+    assert load_birthdays() is first
+    birthdays_file.write_text(json.dumps([{"фамилия": "Новый", "имя": "Человек", "дата рождения": "1 мая"}], ensure_ascii=False), encoding="utf-8")
+    assert load_birthdays() == [(5, 1, "Новый Человек")]
@@ -13,4 +13,10 @@ def test_save_and_load_json(tmp_db_file):
     data = {"key": "value"}
     Database.save_json(tmp_db_file, data)
     result = Database.load_json(tmp_db_file)
-    assert result == data
\ No newline at end of file
+    assert result == data
+
+def test_write_atomic_replaces_file_without_leftovers(tmp_db_file):
+    tmp_db_file.write_bytes(b"old")
+    Database.write_atomic(tmp_db_file, b"new")
+    assert tmp_db_file.read_bytes() == b"new"
+    assert not tmp_db_file.with_name(tmp_db_file.name + ".tmp").exists()
@@ -1,6 +1,6 @@
 import pytest
-import os
 import json
+import asyncio
 from datetime import datetime, timedelta
 import Open_Source  # ✅ импортируем весь модуль
 
@@ -12,7 +12,7 @@ def test_deadlines_file(monkeypatch, tmp_path):
         "title": "Test",
         "subject": "Math",
         "description": "Homework",
-        "due_date": (datetime.now() + timedelta(days=2)).isoformat(),
+        "due_date": (Open_Source.local_now() + timedelta(days=2)).isoformat(),
         "is_private": True,
         "created_by_id": 123,
         "created_in_chat": 456,
@@ -20,6 +20,8 @@ def test_deadlines_file(monkeypatch, tmp_path):
     }]
     test_file.write_text(json.dumps(sample), encoding="utf-8")
     monkeypatch.setattr("Open_Source.DEADLINES_FILE", str(test_file))
+    # Свой буфер журнала у каждого теста
+    monkeypatch.setattr("Open_Source.deadline_ops", Open_Source.DeadlineOpLog())
     return test_file
 
 def test_load_deadlines(test_deadlines_file):
@@ -31,4 +33,470 @@ def test_save_deadlines(test_deadlines_file):
     Open_Source.save_deadlines()
     with open(test_deadlines_file, "r", encoding="utf-8") as f:
         data = json.load(f)
-        assert data[0]["title"] == "Test"
\ No newline at end of file
+        assert data[0]["title"] == "Test"
+
+def test_load_deadlines_removes_duplicates(test_deadlines_file):
+    sample = json.loads(test_deadlines_file.read_text(encoding="utf-8"))
+    duplicate = dict(sample[0], deadline_id=2)
+    test_deadlines_file.write_text(json.dumps(sample + [duplicate]), encoding="utf-8")
+    Open_Source.load_deadlines()
+    assert len(Open_Source.deadlines) == 1
+    assert set(Open_Source.deadlines_by_id) == {1}
+
+def test_load_deadlines_reassigns_colliding_ids(test_deadlines_file):
+    sample = json.loads(test_deadlines_file.read_text(encoding="utf-8"))
+    first = dict(sample[0], deadline_id=3, title="first")
+    second = dict(sample[0], deadline_id=3, title="second")
+    test_deadlines_file.write_text(json.dumps([first, second]), encoding="utf-8")
+    Open_Source.load_deadlines()
+    assert sorted(Open_Source.deadlines_by_id) == [3, 4]
+
+    # Новые ID сохранены, и каждый дедлайн удаляется по своему ID
+    Open_Source.load_deadlines()
+    assert Open_Source.remove_deadline(3)["title"] == "first"
+    assert Open_Source.remove_deadline(4)["title"] == "second"
+    assert not Open_Source.deadlines
+
+def test_remove_deadline_by_id(test_deadlines_file):
+    Open_Source.load_deadlines()
+    removed = Open_Source.remove_deadline(1)
+    assert removed["title"] == "Test"
+    assert Open_Source.remove_deadline(1) is None
+    assert not Open_Source.deadlines
+    assert Open_Source.add_deadline(removed)
+
+def test_dispatch_sends_due_reminders_once(test_deadlines_file, monkeypatch):
+    Open_Source.load_deadlines()
+    deadline = Open_Source.deadlines[0]
+    deadline["due_date"] = Open_Source.local_now() + timedelta(days=1) - timedelta(minutes=1)
+    Open_Source.cancel_deadline_reminders(1)
+    sent = []
+
+    async def fake_send(chat_id, due_time, days_before, deadline_data, bot=None):
+        sent.append(days_before)
+
+    monkeypatch.setattr(Open_Source, "send_deadline_notification", fake_send)
+    asyncio.run(Open_Source.dispatch_deadline_reminders())
+    asyncio.run(Open_Source.dispatch_deadline_reminders())
+    assert sent == [1]
+
+def test_fired_reminders_are_pruned(test_deadlines_file):
+    Open_Source.load_deadlines()
+    base = Open_Source.deadlines[0]
+    Open_Source.add_deadline(dict(base, deadline_id=2, title="Old",
+                                  due_date=Open_Source.local_now() - timedelta(days=1)))
+    Open_Source._fired_reminders.update({(1, 5), (2, 0), (3, 0)})
+
+    Open_Source.remove_deadline(1)
+    assert (1, 5) not in Open_Source._fired_reminders
+
+    # Истекшие и уже удаленные дедлайны теряют отметки на ближайшем тике
+    asyncio.run(Open_Source.dispatch_deadline_reminders())
+    assert not Open_Source._fired_reminders
+
+def test_restart_sends_missed_reminders_but_not_already_sent_ones(test_deadlines_file, monkeypatch):
+    sent = []
+
+    async def fake_send(chat_id, due_time, days_before, deadline_data, bot=None):
+        sent.append((deadline_data["deadline_id"], days_before))
+
+    monkeypatch.setattr(Open_Source, "send_deadline_notification", fake_send)
+    monkeypatch.setattr(Open_Source.deadline_scheduler, "add_job", lambda *args, **kwargs: None)
+
+    # Напоминание за день по дедлайну 1 уже ушло до перезапуска
+    Open_Source.load_deadlines()
+    now = Open_Source.local_now()
+    sent_before = Open_Source.remove_deadline(1)
+    Open_Source.add_deadline(dict(sent_before, due_date=now + timedelta(days=1) - timedelta(minutes=10)))
+    Open_Source.compact_deadlines()
+    asyncio.run(Open_Source.dispatch_deadline_reminders())
+    assert sent == [(1, 1)]
+
+    # Напоминание по дедлайну 2 наступило, пока бот был выключен
+    missed = dict(sent_before, deadline_id=2, title="Missed",
+                  due_date=now + timedelta(days=1) - timedelta(minutes=5))
+    Open_Source.add_deadline(missed)
+    Open_Source.log_deadline_added(missed)
+    Open_Source.deadline_ops.flush()
+
+    # Перезапуск: буфер и отметки в памяти потеряны
+    monkeypatch.setattr("Open_Source.deadline_ops", Open_Source.DeadlineOpLog())
+    Open_Source._fired_reminders.clear()
+    sent.clear()
+    Open_Source.load_deadlines()
+    Open_Source.restore_deadline_reminders()
+    asyncio.run(Open_Source.dispatch_deadline_reminders())
+    assert sent == [(2, 1)]
+
+    # Отметки переживают и сворачивание журнала при следующей загрузке
+    sent.clear()
+    Open_Source._fired_reminders.clear()
+    Open_Source.load_deadlines()
+    Open_Source.restore_deadline_reminders()
+    asyncio.run(Open_Source.dispatch_deadline_reminders())
+    assert sent == []
+
+def test_due_date_is_saved_as_timestamp(test_deadlines_file):
+    Open_Source.load_deadlines()
+    due = Open_Source.deadlines[0]["due_date"]
+    Open_Source.save_deadlines()
+    data = json.loads(test_deadlines_file.read_text(encoding="utf-8"))
+    assert data[0]["due_date"] == int(Open_Source._due_ts(due))
+    Open_Source.load_deadlines()
+    assert Open_Source.deadlines[0]["due_date"] == due.replace(microsecond=0)
+
+def test_load_deadlines_async(test_deadlines_file):
+    Open_Source._rebuild_deadlines(())
+    asyncio.run(Open_Source.load_deadlines_async())
+    assert set(Open_Source.deadlines_by_id) == {1}
+
+def test_public_notification_reuses_personal_text(test_deadlines_file, monkeypatch):
+    Open_Source.load_deadlines()
+    deadline = dict(Open_Source.deadlines[0], is_private=False)
+    monkeypatch.setattr(Open_Source, "known_users", frozenset({10, 20}))
+    texts = {}
+
+    class FakeBot:
+        async def send_message(self, chat_id, text, parse_mode=None):
+            texts[chat_id] = text
+
+    asyncio.run(Open_Source.send_deadline_notification(
+        456, deadline["due_date"], 1, deadline, bot=FakeBot()
+    ))
+    assert texts[10] is texts[20]
+    assert texts[10].startswith("📢 <b>Общий дедлайн</b>\n⏰")
+
+def test_deadlines_are_kept_sorted_and_split(test_deadlines_file):
+    Open_Source.load_deadlines()
+    base = Open_Source.deadlines[0]
+    now = Open_Source.local_now()
+    past = dict(base, deadline_id=2, title="Past", due_date=now - timedelta(days=1))
+    later = dict(base, deadline_id=3, title="Later", due_date=now + timedelta(days=1))
+    assert Open_Source.add_deadline(past)
+    assert Open_Source.add_deadline(later)
+    assert [d["deadline_id"] for d in Open_Source.deadlines] == [2, 3, 1]
+
+    split = Open_Source.deadlines_split(now)
+    assert [d["deadline_id"] for d in Open_Source.deadlines[:split]] == [2]
+
+    Open_Source.remove_deadline(3)
+    assert [d["deadline_id"] for d in Open_Source.deadlines] == [2, 1]
+    assert Open_Source._due_keys == [Open_Source._due_ts(d["due_date"]) for d in Open_Source.deadlines]
+
+def test_deadline_cards_are_batched_into_chunks(test_deadlines_file):
+    Open_Source.load_deadlines()
+    base = Open_Source.deadlines[0]
+    items = [dict(base, deadline_id=i, title=f"T{i}") for i in (1, 2, 3)]
+    card = len(Open_Source._format_deadline(items[0]))
+
+    assert len(Open_Source._chunk_deadline_cards(items)) == 1
+    chunks = Open_Source._chunk_deadline_cards(items, limit=2 * card + 2)
+    assert len(chunks) == 2
+    assert "ID: 1" in chunks[0] and "ID: 2" in chunks[0] and "ID: 3" in chunks[1]
+
+    assert len(Open_Source._chunk_deadline_cards(items, max_cards=2)) == 2
+
+def test_render_deadline_page_navigation(test_deadlines_file):
+    Open_Source.load_deadlines()
+    base = Open_Source.deadlines[0]
+    items = [dict(base, deadline_id=i, title=f"T{i}") for i in range(1, 26)]
+
+    text, keyboard = Open_Source._render_deadline_page(items, "actual", 1)
+    assert "(стр. 2/3)" in text and "ID: 11</b>" in text and "ID: 21</b>" not in text
+    assert [b.callback_data for b in keyboard.inline_keyboard[0]] == ["dl_page:actual:0", "dl_page:actual:2"]
+
+    # Номер за пределами списка сводится к последней странице
+    text, keyboard = Open_Source._render_deadline_page(items, "actual", 9)
+    assert "(стр. 3/3)" in text
+    assert [b.callback_data for b in keyboard.inline_keyboard[0]] == ["dl_page:actual:1"]
+
+def test_broadcast_counts_delivered_messages(monkeypatch):
+    monkeypatch.setattr(Open_Source, "BROADCAST_RATE", 1000)
+    sent = []
+
+    class FakeBot:
+        async def send_message(self, chat_id, text, **kwargs):
+            if chat_id == 2:
+                raise RuntimeError("blocked")
+            sent.append(chat_id)
+
+    delivered = asyncio.run(Open_Source.broadcast(FakeBot(), [1, 2, 3], "hi"))
+    assert delivered == 2
+    assert sorted(sent) == [1, 3]
+
+def test_broadcast_copy_copies_message_to_each_chat(monkeypatch):
+    monkeypatch.setattr(Open_Source, "BROADCAST_RATE", 1000)
+    copied = []
+
+    class FakeBot:
+        async def copy_message(self, chat_id, from_chat_id, message_id):
+            copied.append((chat_id, from_chat_id, message_id))
+
+    delivered = asyncio.run(Open_Source.broadcast_copy(FakeBot(), [1, 2], -100, 7))
+    assert delivered == 2
+    assert sorted(copied) == [(1, -100, 7), (2, -100, 7)]
+
+def test_due_date_epoch_does_not_depend_on_host_timezone(test_deadlines_file, monkeypatch):
+    from zoneinfo import ZoneInfo
+    due = datetime(2030, 1, 1, 12, 0)
+    # 12:00 в Екатеринбурге (UTC+5) — 07:00 UTC
+    assert Open_Source._encode_due_date(due) == int(datetime(2030, 1, 1, 7, 0, tzinfo=ZoneInfo("UTC")).timestamp())
+
+    monkeypatch.setattr("Open_Source.TZ", ZoneInfo("UTC"))
+    epoch = Open_Source._encode_due_date(due)
+    assert epoch == int(datetime(2030, 1, 1, 12, 0, tzinfo=ZoneInfo("UTC")).timestamp())
+    assert Open_Source._parse_deadline({"due_date": epoch})["due_date"] == due
+
+def test_visible_deadlines_hides_foreign_private(test_deadlines_file):
+    Open_Source.load_deadlines()
+    base = Open_Source.deadlines[0]
+    Open_Source.add_deadline(dict(base, deadline_id=2, title="Public", is_private=False, created_by_id=999))
+    Open_Source.add_deadline(dict(base, deadline_id=3, title="Past", due_date=Open_Source.local_now() - timedelta(days=1)))
+    now = Open_Source._due_ts(Open_Source.local_now())
+
+    assert [d["deadline_id"] for d in Open_Source.visible_deadlines(999, False, now)] == [2]
+    assert sorted(d["deadline_id"] for d in Open_Source.visible_deadlines(123, False, now)) == [1, 2]
+    assert [d["deadline_id"] for d in Open_Source.visible_deadlines(123, True, now)] == [3]
+
+def test_parse_deadline_date():
+    assert Open_Source.parse_deadline_date("2030-05-01 14:30") == datetime(2030, 5, 1, 14, 30)
+    assert Open_Source.parse_deadline_date("2030-05-01") is None
+    assert Open_Source.parse_deadline_date("2030-05-01", require_time=False) == datetime(2030, 5, 1, 23, 59)
+    assert Open_Source.parse_deadline_date("2030-02-30 10:00") is None
+    assert Open_Source.parse_deadline_date("завтра") is None
+
+def test_changes_are_logged_and_replayed(test_deadlines_file):
+    Open_Source.load_deadlines()
+    added = dict(Open_Source.deadlines[0], deadline_id=Open_Source.next_deadline_id(), title="Logged")
+    assert added["deadline_id"] == 2
+    Open_Source.add_deadline(added)
+    Open_Source.log_deadline_added(added)
+    Open_Source.remove_deadline(1)
+    Open_Source.log_deadline_removed(1)
+
+    # Снимок не перезаписывался, изменения только в журнале
+    assert json.loads(test_deadlines_file.read_text(encoding="utf-8"))[0]["deadline_id"] == 1
+
+    Open_Source.load_deadlines()
+    assert set(Open_Source.deadlines_by_id) == {2}
+    # После загрузки журнал свернут в снимок
+    log_path = test_deadlines_file.with_suffix(".log")
+    assert log_path.read_bytes() == b""
+    assert [d["deadline_id"] for d in json.loads(test_deadlines_file.read_text(encoding="utf-8"))] == [2]
+
+def test_format_due_matches_strftime():
+    dt = datetime(2030, 1, 2, 3, 4, 5, 678)
+    assert Open_Source.format_due(dt) == dt.strftime("%Y-%m-%d %H:%M")
+
+def test_update_now_ts_uses_stamped_time():
+    import contextvars
+    import time
+
+    def stamped():
+        Open_Source._now_ts.set(42.0)
+        return Open_Source.update_now_ts()
+
+    assert contextvars.copy_context().run(stamped) == 42.0
+    # Вне апдейта — текущее время
+    assert abs(Open_Source.update_now_ts() - time.time()) < 5
+
+def test_announce_removed_copies_group_post(monkeypatch, test_deadlines_file):
+    from types import SimpleNamespace
+    Open_Source.load_deadlines()
+    monkeypatch.setattr(Open_Source, "BROADCAST_RATE", 1000)
+    monkeypatch.setattr(Open_Source, "known_users", frozenset({1, 2, 3}))
+    monkeypatch.setattr(Open_Source, "group_chat_id", -100)
+    copied = []
+
+    class FakeBot:
+        async def send_message(self, chat_id, text, parse_mode=None):
+            return SimpleNamespace(message_id=7)
+
+        async def copy_message(self, chat_id, from_chat_id, message_id, disable_notification=False):
+            assert disable_notification
+            copied.append((chat_id, from_chat_id, message_id))
+
+    async def run():
+        tasks = []
+        context = SimpleNamespace(
+            bot=FakeBot(),
+            application=SimpleNamespace(create_task=lambda c: tasks.append(asyncio.ensure_future(c))),
+        )
+        update = SimpleNamespace(effective_user=SimpleNamespace(id=2))
+        await Open_Source.announce_public_deadline_removed(update, context, Open_Source.deadlines[0], "x")
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    assert sorted(copied) == [(1, -100, 7), (3, -100, 7)]
+
+def test_deadline_ids_are_not_reused_after_removal(test_deadlines_file):
+    Open_Source.load_deadlines()
+    added = dict(Open_Source.deadlines[0], deadline_id=Open_Source.next_deadline_id(), title="Last")
+    Open_Source.add_deadline(added)
+    Open_Source.log_deadline_added(added)
+    Open_Source.remove_deadline(2)
+    Open_Source.log_deadline_removed(2)
+    assert Open_Source.next_deadline_id() == 3
+
+    # Счетчик переживает перезагрузку и сворачивание журнала
+    Open_Source.load_deadlines()
+    Open_Source.load_deadlines()
+    assert set(Open_Source.deadlines_by_id) == {1}
+    assert Open_Source.next_deadline_id() == 3
+
+def test_visible_deadlines_merges_public_and_own_private_by_date(test_deadlines_file):
+    Open_Source.load_deadlines()
+    base = dict(Open_Source.deadlines[0], is_private=False, created_by_id=999)
+    now = Open_Source.local_now()
+    Open_Source.add_deadline(dict(base, deadline_id=2, title="Soon", due_date=now + timedelta(hours=1)))
+    Open_Source.add_deadline(dict(base, deadline_id=3, title="Mine", is_private=True, created_by_id=5,
+                                  due_date=now + timedelta(hours=2)))
+    Open_Source.add_deadline(dict(base, deadline_id=4, title="Later", due_date=now + timedelta(days=400)))
+
+    visible = Open_Source.visible_deadlines(5, False, Open_Source._due_ts(now))
+    assert [d["deadline_id"] for d in visible if d["deadline_id"] != 1] == [2, 3, 4]
+    assert visible == sorted(visible, key=lambda d: d["due_date"])
+
+    Open_Source.remove_deadline(3)
+    assert 5 not in Open_Source._deadlines_by_owner
+
+def test_deadline_ops_are_buffered_until_flush(test_deadlines_file):
+    Open_Source.load_deadlines()
+    log_path = test_deadlines_file.with_suffix(".log")
+    Open_Source.log_deadline_removed(1)
+    assert not log_path.exists()
+
+    Open_Source.deadline_ops.flush()
+    assert json.loads(log_path.read_bytes()) == {"op": "del", "id": 1}
+
+def test_async_compaction_folds_pending_ops_into_snapshot(test_deadlines_file):
+    Open_Source.load_deadlines()
+    Open_Source.remove_deadline(1)
+    Open_Source.log_deadline_removed(1)
+
+    asyncio.run(Open_Source.compact_deadlines_async())
+    assert Open_Source.deadline_ops.pending_count() == 0
+    assert json.loads(test_deadlines_file.read_text(encoding="utf-8")) == []
+    Open_Source.load_deadlines()
+    assert Open_Source.deadlines == []
+
+@pytest.mark.parametrize("run_compaction", [
+    Open_Source.compact_deadlines,
+    lambda: asyncio.run(Open_Source.compact_deadlines_async()),
+])
+def test_compaction_interrupted_before_log_reset_keeps_removals(test_deadlines_file, monkeypatch, run_compaction):
+    Open_Source.load_deadlines()
+    added = dict(Open_Source.deadlines[0], deadline_id=Open_Source.next_deadline_id(), title="X")
+    Open_Source.add_deadline(added)
+    Open_Source.log_deadline_added(added)
+    Open_Source.deadline_ops.flush()
+    Open_Source.remove_deadline(added["deadline_id"])
+    Open_Source.log_deadline_removed(added["deadline_id"])
+
+    # Процесс падает после записи снимка, но до очистки журнала
+    def crash():
+        raise OSError("crash")
+    monkeypatch.setattr("Open_Source._reset_deadlines_log", crash)
+    run_compaction()
+    monkeypatch.undo()
+    monkeypatch.setattr("Open_Source.DEADLINES_FILE", str(test_deadlines_file))
+    monkeypatch.setattr("Open_Source.deadline_ops", Open_Source.DeadlineOpLog())
+
+    Open_Source.load_deadlines()
+    assert [d["title"] for d in Open_Source.deadlines] == ["Test"]
+
+def test_announce_removed_posts_once_to_channel(monkeypatch, test_deadlines_file):
+    from types import SimpleNamespace
+    Open_Source.load_deadlines()
+    monkeypatch.setattr(Open_Source, "known_users", frozenset({1, 2, 3}))
+    monkeypatch.setattr(Open_Source, "group_chat_id", -100)
+    monkeypatch.setattr(Open_Source.Config, "BROADCAST_CHANNEL_ID", -200)
+    sent, tasks = [], []
+
+    class FakeBot:
+        async def send_message(self, chat_id, text, parse_mode=None):
+            sent.append(chat_id)
+            return SimpleNamespace(message_id=7)
+
+    context = SimpleNamespace(bot=FakeBot(), application=SimpleNamespace(create_task=tasks.append))
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=2))
+    asyncio.run(Open_Source.announce_public_deadline_removed(update, context, Open_Source.deadlines[0], "x"))
+    assert sent == [-100, -200]
+    assert tasks == []
+
+def test_reply_templates_fill_from_deadline(test_deadlines_file):
+    Open_Source.load_deadlines()
+    d = Open_Source.deadlines[0]
+    added = Open_Source._DEADLINE_ADDED_TEMPLATE.format_map(d | {
+        'date_str': "2030-01-01 10:00", 'visibility': "(Личный)", 'author_mention': "Автор",
+    })
+    assert "ID: 1\n" in added and "Тип: (Личный)" in added
+    removed = Open_Source._DEADLINE_REMOVED_REPLY_TEMPLATE.format_map(d | {'remover_mention': "Кто-то"})
+    assert removed.startswith("❌ Дедлайн ID=1 удалён!") and "Предмет: Math / Задание: Test" in removed
+
+def test_author_mention_escapes_name():
+    assert Open_Source._author_mention(5, "<Tom & Jerry>") == '<a href="tg://user?id=5">&lt;Tom &amp; Jerry&gt;</a>'
+
+def test_route_callback_dispatches_by_data(monkeypatch):
+    from types import SimpleNamespace
+    seen = []
+
+    async def fake_page(update, context):
+        seen.append(update.callback_query.data)
+
+    monkeypatch.setitem(Open_Source._CALLBACK_PREFIX_ROUTES, "dl_page", fake_page)
+    answered = []
+
+    async def answer():
+        answered.append(True)
+
+    for data in ("dl_page:actual:2", "unknown"):
+        update = SimpleNamespace(callback_query=SimpleNamespace(data=data, answer=answer))
+        asyncio.run(Open_Source.route_callback(update, None))
+    assert seen == ["dl_page:actual:2"]
+    assert answered == [True]
+    assert Open_Source._CALLBACK_ROUTES["deadline_list_expired"] is Open_Source.deadline_menu_callback
+
+def test_duplicate_deadline_ends_add_flow(test_deadlines_file):
+    from types import SimpleNamespace
+    Open_Source.load_deadlines()
+    existing = Open_Source.deadlines[0]
+    replies = []
+
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    update = SimpleNamespace(
+        effective_user=SimpleNamespace(id=123, full_name="Test User"),
+        effective_chat=SimpleNamespace(id=456),
+        message=SimpleNamespace(reply_text=reply_text),
+    )
+    context = SimpleNamespace(user_data={
+        'state': Open_Source.STATE_ADD_COMMENT,
+        'deadline_flow': {
+            'is_private': True,
+            'subject': existing['subject'],
+            'title': existing['title'],
+            'due_date': existing['due_date'],
+            'due_date_str': Open_Source.format_due(existing['due_date']),
+        },
+    })
+    handlers = Open_Source.CommandHandlers(None, None)
+    asyncio.run(handlers._flow_comment(update, context, existing['description']))
+
+    assert replies == ["❗️ Такой дедлайн уже существует."]
+    assert context.user_data == {'state': Open_Source.STATE_IDLE, 'deadline_flow': {}}
+
+def test_post_shutdown_stops_scheduler(test_deadlines_file, monkeypatch):
+    from types import SimpleNamespace
+    from apscheduler.schedulers.asyncio import AsyncIOScheduler
+    Open_Source.load_deadlines()
+    monkeypatch.setattr("Open_Source.deadline_scheduler", AsyncIOScheduler(timezone=Open_Source.TZ))
+    bot = SimpleNamespace(_flush_task=None, action_manager=SimpleNamespace(flush=lambda: None))
+
+    async def run():
+        Open_Source.deadline_scheduler.start()
+        await Open_Source.StudentBot._post_shutdown(bot, None)
+
+    asyncio.run(run())
+    assert not Open_Source.deadline_scheduler.running
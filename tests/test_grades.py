@@ -0,0 +1,20 @@
+from telegram import Chat
+from Open_Source import parse_grades, get_grade_word, _prompt_for, _DIPLOMA_PROMPT_GROUP, _SUBJECT_PROMPT_PRIVATE
+
+def test_parse_grades_skips_non_numeric():
+    grades, bad = parse_grades("8 abc 9,5 7".replace(',', ' ').split())
+    assert grades == [8.0, 9.0, 5.0, 7.0]
+    assert bad is None
+
+def test_parse_grades_reports_first_out_of_range():
+    grades, bad = parse_grades(["8", "11", "0"])
+    assert bad == 11.0
+
+def test_grade_word_thresholds():
+    assert get_grade_word(9.5) == "Отлично с отличием"
+    assert get_grade_word(7.0) == "Очень хорошо"
+    assert get_grade_word(3.9) == "Неудовлетворительно"
+
+def test_prompt_for_chat_type():
+    assert _prompt_for(True, Chat.SUPERGROUP) == _DIPLOMA_PROMPT_GROUP
+    assert _prompt_for(False, Chat.PRIVATE) == _SUBJECT_PROMPT_PRIVATE
@@ -0,0 +1,13 @@
+import pytest
+from telegram.error import TelegramError
+from Open_Source import OrjsonRequest
+
+def test_parse_json_payload_uses_orjson():
+    assert OrjsonRequest.parse_json_payload(b'{"ok": true, "result": [1, 2]}') == {"ok": True, "result": [1, 2]}
+
+def test_parse_json_payload_falls_back_on_bad_utf8():
+    assert OrjsonRequest.parse_json_payload(b'{"text": "\xff"}') == {"text": "�"}
+
+def test_parse_json_payload_rejects_invalid_json():
+    with pytest.raises(TelegramError):
+        OrjsonRequest.parse_json_payload(b'not json')
@@ -1,6 +1,7 @@
 import pytest
 from pathlib import Path
 import tempfile
+import Open_Source
 from Open_Source import UserManager
 
 @pytest.fixture
@@ -12,4 +13,40 @@ def tmp_user_file():
 def test_add_user_and_get_users(tmp_user_file):
     manager = UserManager(tmp_user_file)
     manager.add_user("100")
-    assert "100" in manager.get_users()
\ No newline at end of file
+    assert "100" in manager.get_users()
+
+def test_users_are_appended_and_reloaded(tmp_user_file):
+    manager = UserManager(tmp_user_file)
+    manager.add_user("100")
+    manager.add_user("100")
+    manager.add_user("200")
+    assert len(tmp_user_file.read_text().splitlines()) == 2
+    assert UserManager(tmp_user_file).get_users() == {"100", "200"}
+
+def test_add_user_publishes_known_users(tmp_user_file):
+    manager = UserManager(tmp_user_file)
+    manager.add_user("300")
+    assert Open_Source.known_users == frozenset({300})
+    assert isinstance(manager.get_users(), frozenset)
+
+def test_only_private_chat_senders_are_registered(tmp_user_file):
+    import asyncio
+    from types import SimpleNamespace
+    from telegram import Chat
+    manager = UserManager(tmp_user_file)
+    handlers = Open_Source.CommandHandlers(manager, None)
+
+    async def reply_text(text, **kwargs):
+        pass
+
+    def send(user_id, chat_type):
+        update = SimpleNamespace(
+            effective_user=SimpleNamespace(id=user_id),
+            effective_chat=SimpleNamespace(id=Open_Source.Config.ALLOWED_GROUP_ID, type=chat_type),
+            message=SimpleNamespace(text="привет", reply_text=reply_text),
+        )
+        asyncio.run(handlers.handle_text(update, SimpleNamespace(user_data={})))
+
+    send(100, Chat.SUPERGROUP)
+    send(200, Chat.PRIVATE)
+    assert manager.get_users() == {"200"}